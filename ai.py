@@ -5,15 +5,19 @@ This file contains function and classes for the Artificial Intelligence used in
 # TODO Använd previous path för att spara shortest om AI:n resetar. Om den sedan resetar igen ska den försöka hitta en path som är annorlunda
 
 import math
+import time
 from collections import defaultdict, deque
 
 import pymunk
 from pymunk import Vec2d
 import gameobjects
+import pathfinding
 import copy
 
 # Constants
 MIN_ANGLE_DIF = math.radians(3)   # 3 degrees, a bit more than we can turn each tick
+LEGACY_BFS = False                # Use the old Breadth First Search passes instead of the weighted A* search
+PLANNING_BUDGET = 5               # Milliseconds per tick that all the Ai together may spend on searching paths
 
 
 def angle_between_vectors(vec1, vec2):
@@ -33,19 +37,134 @@ def periodic_difference_of_angles(angle1, angle2):
     return (angle1 % (2 * math.pi)) - (angle2 % (2 * math.pi))
 
 
+class PlanningScheduler:
+    """
+    Shares a time budget per tick between the path searches of all the Ai. The Ai
+    plan in priority order, and a search that doesn't fit in what is left of the
+    budget is resumed on the next tick.
+    """
+
+    def __init__(self, budget_ms=PLANNING_BUDGET):
+        """
+        Takes as argument the number of milliseconds the searches may use per tick (budget_ms).
+        """
+        self.budget = budget_ms / 1000
+        self.used = 0                   # Seconds used by the searches of the current tick
+        self.waiting = defaultdict(int)  # Number of ticks every Ai has been waiting for its search
+        self.history = deque(maxlen=50)  # Milliseconds used in each of the last ticks
+        self.deferred = 0               # Number of times a search had to wait for the next tick
+
+    def begin_tick(self, ai_list):
+        """
+        Starts a new tick and returns the Ai in the order they should plan: the pursuers of
+        the flag carrier first, then the Ai that have been waiting the longest.
+        """
+        self.history.append(self.used * 1000)
+        self.used = 0
+        return sorted(ai_list, key=lambda bot: (not bot.is_pursuer(), -self.waiting[bot]))
+
+    def run(self, bot, search):
+        """
+        Calls search with the deadline of the budget left in this tick. Returns what it
+        returns, or None if the search didn't finish or there was no time left to start it.
+        """
+        start = time.perf_counter()
+        if self.used >= self.budget:
+            self.waiting[bot] += 1
+            self.deferred += 1
+            return None
+        result = search(deadline=start + self.budget - self.used)
+        self.used += time.perf_counter() - start
+        if result is None:
+            self.waiting[bot] += 1
+        else:
+            self.waiting.pop(bot, None)
+        return result
+
+    def stats(self):
+        """
+        Returns how much of the budget the searches have used over the last ticks.
+        """
+        return {
+            "budget_ms": self.budget * 1000,
+            "last_ms": self.history[-1] if self.history else 0.0,
+            "average_ms": sum(self.history) / len(self.history) if self.history else 0.0,
+            "max_ms": max(self.history, default=0.0),
+            "deferred": self.deferred
+        }
+
+
+class FlagRoute:
+    """
+    The route home of the tank carrying the flag, shared read-only with all the Ai.
+    It is only searched when the flag is picked up, when the grid changes or when the
+    carrier leaves it, and the searched routes are cached per base. While the carrier
+    follows it, the part of the route still ahead is published as an immutable tuple,
+    and version is increased every time the published tiles change.
+    """
+
+    def __init__(self, grid):
+        """
+        Takes as argument the grid of the map, whose revision tells when the route is outdated.
+        """
+        self.grid = grid
+        self.routes = {}        # (start tile, base tile, grid revision) -> route
+        self.version = 0
+        self.clear()
+
+    def clear(self):
+        """
+        Has to be called when nobody carries the flag anymore.
+        """
+        self.carrier = None
+        self.route = ()
+        self.route_index = {}   # Tile -> its position in the route
+        self.revision = None
+        self.index = None       # Position of the carrier in the route
+        self.tiles = None       # The part of the route that is still ahead of the carrier
+        self.version += 1
+
+    def update(self, bot):
+        """
+        Updates the route of bot, which carries the flag. Returns True if the published tiles changed.
+        """
+        tile = bot.get_tile_of_position(bot.tank.body.position).int_tuple
+        if bot is not self.carrier or self.revision != self.grid.revision or tile not in self.route_index:
+            if self.revision != self.grid.revision:
+                self.routes.clear()
+            base = bot.get_tile_of_position(bot.tank.start_position).int_tuple
+            key = (tile, base, self.grid.revision)
+            if key not in self.routes:
+                self.routes[key] = tuple(bot.reveal_position(start=bot.tank.start_position))
+            self.carrier = bot
+            self.revision = self.grid.revision
+            self.route = self.routes[key]
+            self.route_index = {coord.int_tuple: index for index, coord in enumerate(self.route)}
+            self.tiles = None
+        index = self.route_index.get(tile)
+        if self.tiles is not None and index == self.index:
+            return False
+        self.index = index
+        # Without a route home, the Ai will go for the flag itself
+        self.tiles = self.route[index:] if index is not None else ()
+        self.version += 1
+        return True
+
+
 class Ai:
     """
-    A simple ai that finds the shortest path to the target using
-    a breadth first search. Also capable of shooting other tanks and or wooden
-    boxes.
+    A simple ai that finds the best path to the target using a weighted
+    A* search (or a breadth first search if LEGACY_BFS is set). Also capable
+    of shooting other tanks and or wooden boxes.
     """
 
-    def __init__(self, tank, game_objects_list, tanks_list, space, currentmap):
+    def __init__(self, tank, game_objects, tanks_list, space, currentmap, grid=None, scheduler=None, process_planner=None, rng=None):
         self.tank = tank
-        self.game_objects_list = game_objects_list
+        self.game_objects = game_objects
         self.tanks_list = tanks_list
         self.space = space
         self.currentmap = currentmap
+        self.grid = grid if grid is not None else pathfinding.Grid(currentmap)    # Passability of the tiles, shared by all Ai on the map
         self.flag = None
         self.max_x = currentmap.width - 1
         self.max_y = currentmap.height - 1
@@ -54,23 +173,43 @@ class Ai:
         self.path = deque()
         self.move_cycle = self.move_cycle_gen()
         self.update_grid_pos()
-        self.bullet_tick = 50
+        self.rng = rng              # Random generator of the match, the Ai don't draw random numbers without it
+        self.bullet_tick = self.start_bullet_tick()
         self.has_fired = False
         self.target_tile = None
         self.shortest_path = None
         self.previous_path = None
         self.other_path = False
+        self.scheduler = scheduler  # Shares the time spent on searches between all Ai, searches aren't limited without it
+        self.process_planner = process_planner  # Searches weighted paths in worker processes, if given
 
     def reveal_position(self, start):
         """
         TEMP: Måste användas till att reveala flaggans position till ai för att de ska använda shortest_path på positionen
         Hitta också tankens start position genom flag och dra shortest på den
         """
-        shortest = self.find_shortest_path(target=self.get_tile_of_position(position_vector=start.int_tuple), second_try=False)
+        home = self.get_tile_of_position(position_vector=start)
+        if not LEGACY_BFS:
+            # The other tanks need the route right away, so it is never searched in another process
+            return self.find_weighted_path(target=home, in_process=True)
+        tile = self.get_tile_of_position(self.tank.body.position)
+        # The precomputed distance field of the base tells if the first search can succeed at all
+        shortest = deque()
+        if self.other_path or self.grid.is_reachable(tile.int_tuple, home.int_tuple, pathfinding.GRASS_AND_WOOD):
+            shortest = self.find_shortest_path(target=home, second_try=False)
         if len(shortest) == 0:
-            shortest = self.find_shortest_path(target=self.get_tile_of_position(position_vector=start.int_tuple), second_try=True)
+            shortest = self.find_shortest_path(target=home, second_try=True)
         return shortest
 
+    def start_bullet_tick(self):
+        """
+        Returns how far the gun has reloaded at the start of a round. With a random generator
+        it is a random part of the cooldown, so matches with different seeds play out differently.
+        """
+        if self.rng is None:
+            return 50
+        return self.rng.randint(0, 50)
+
     def update_grid_pos(self):
         """
         This should only be called in the beginning, or at the end of a move_cycle.
@@ -92,18 +231,25 @@ class Ai:
         # Cooldown for bullet
         if (self.bullet_tick != 50):
             self.bullet_tick += 1
-        else:
-            angle = self.tank.body.angle + (math.pi / 2)
-            offset = 1
-            start = (self.tank.body.position[0] + offset * math.cos(angle), self.tank.body.position[1] + offset * math.sin(angle))
-            end = (self.tank.body.position[0] + self.currentmap.width * math.cos(angle), self.tank.body.position[1] + self.currentmap.width * math.sin(angle))
-            radius = 0
-            query_res = self.space.segment_query_first(start, end, radius, pymunk.ShapeFilter())
-            if hasattr(query_res, "shape"):
-                if hasattr(query_res.shape, "parent"):
-                    if isinstance(query_res.shape.parent, gameobjects.Tank) or ((isinstance(query_res.shape.parent, gameobjects.Box) and query_res.shape.parent.destructable)):
-                        self.bullet_tick = 0
-                        self.has_fired = True
+        elif self.target_in_front():
+            self.bullet_tick = 0
+            self.has_fired = True
+
+    def target_in_front(self):
+        """
+        Checks if the first thing in front of the tank is another tank or a wooden box.
+        """
+        angle = self.tank.body.angle + (math.pi / 2)
+        offset = 1
+        start = (self.tank.body.position[0] + offset * math.cos(angle), self.tank.body.position[1] + offset * math.sin(angle))
+        end = (self.tank.body.position[0] + self.currentmap.width * math.cos(angle), self.tank.body.position[1] + self.currentmap.width * math.sin(angle))
+        radius = 0
+        query_res = self.space.segment_query_first(start, end, radius, pymunk.ShapeFilter())
+        if hasattr(query_res, "shape"):
+            if hasattr(query_res.shape, "parent"):
+                if isinstance(query_res.shape.parent, gameobjects.Tank) or ((isinstance(query_res.shape.parent, gameobjects.Box) and query_res.shape.parent.destructable)):
+                    return True
+        return False
 
     def switch(self, original_path):
         if self.previous_path == original_path:
@@ -120,13 +266,7 @@ class Ai:
         """
         reset = 0
         while True:
-            self.shortest_path = self.find_shortest_path()                                      # Prepare shortest path
-            if len(self.shortest_path) == 0:
-                self.shortest_path = self.find_shortest_path(target=None, second_try=True)      # Finds path through metal boxes
-            if self.other_path:
-                self.shortest_path = self.find_shortest_path(target=None)                       # Finds path excluding shortest_path
-            if len(self.shortest_path) == 0:
-                self.shortest_path = self.find_shortest_path(target=None, second_try=True)      # Finds path through metal boxes when other_path is True
+            self.shortest_path = yield from self.plan_path()            # Prepare shortest path
             original_path = copy.copy(self.shortest_path)
 
             try:
@@ -165,42 +305,109 @@ class Ai:
             self.forced_reset = False
             reset = 0
 
-    def find_shortest_path(self, target=None, second_try=False):
+    def plan_path(self):
         """
-        A simple Breadth First Search using integer coordinates as our nodes.
-        Edges are calculated as we go, using an external function.
+        A generator that finds the path to our goal. If the scheduler runs out of
+        budget, or the path is searched in another process, it yields and the
+        search is resumed on the next tick.
         """
-        def save(deq: deque, node):
-            deq.append(node)
-            return deq
+        while True:
+            if self.scheduler is None:
+                path = self.find_path()
+            else:
+                path = self.scheduler.run(self, self.find_path)
+            if path is not None:
+                return path
+            yield
 
-        shortest_path = []
-        queue = deque()
-        visited_nodes = set()
+    def find_path(self, deadline=None):
+        """
+        Finds the path to our goal. Returns None if the deadline (time.perf_counter())
+        was reached before the search was done.
+        """
+        if not LEGACY_BFS:
+            return self.find_weighted_path(deadline=deadline)           # Finds the best path through all boxes at once
+        shortest_path = self.find_shortest_path()
+        if len(shortest_path) == 0:
+            shortest_path = self.find_shortest_path(target=None, second_try=True)       # Finds path through metal boxes
+        if self.other_path:
+            shortest_path = self.find_shortest_path(target=None)                        # Finds path excluding shortest_path
+        if len(shortest_path) == 0:
+            shortest_path = self.find_shortest_path(target=None, second_try=True)       # Finds path through metal boxes when other_path is True
+        return shortest_path
+
+    def is_pursuer(self):
+        """
+        Checks if we are chasing a tank that carries the flag. The route of the carrier
+        is empty when it has no way home, and then there is nothing to chase.
+        """
+        return bool(self.target_tile) and self.tank.flag is None
 
+    def get_search_tiles(self, target=None):
+        """
+        Returns the packed tile indices where a search starts and ends, or None
+        as goal if the target isn't on the map. Without a target, the search
+        goes from our grid position to the target tile.
+        """
         if target is None:
-            queue.append((self.grid_pos, deque()))
-            visited_nodes.add(self.grid_pos.int_tuple)
+            start = self.grid_pos
+            target = self.get_target_tile()
         else:
-            queue.append((self.get_tile_of_position(self.tank.body.position), deque()))
-            visited_nodes.add(self.get_tile_of_position(self.tank.body.position).int_tuple)
-
-        while not len(queue) == 0:
-            current_node, path = queue.popleft()
-            temp = path
-            if target is None:
-                target = self.get_target_tile()
-            if (current_node == target):            # Stanna om man hittar flaggan
-                deq = save(copy.deepcopy(temp), current_node)
-                for coord in deq:
-                    shortest_path.append(coord)
-                break
-            for neighbor in self.get_tile_neighbors(coord_vec=current_node.int_tuple, second_try=second_try):           # Går igenom alla grannar
-                if neighbor not in visited_nodes:
-                    deq = save(copy.deepcopy(temp), current_node)
-                    queue.append((neighbor, deq))
-                    visited_nodes.add(neighbor.int_tuple)
-        return deque(shortest_path)
+            start = self.get_tile_of_position(self.tank.body.position)
+
+        width = self.currentmap.width
+        start = pathfinding.pack(start[0], start[1], width)
+        if not self.is_on_map(target):
+            return start, None
+        return start, pathfinding.pack(int(target[0]), int(target[1]), width)
+
+    def find_shortest_path(self, target=None, second_try=False):
+        """
+        A Breadth First Search using packed integer tile indices as our nodes.
+        Every visited tile remembers where it was reached from, so the path
+        is only rebuilt once the target has been found. Paths are shared
+        between all Ai through the path cache of the grid.
+        """
+        start, goal = self.get_search_tiles(target)
+        if goal is None:
+            return deque()
+        width = self.currentmap.width
+        if second_try:
+            path = self.grid.find_path(start, goal, pathfinding.THROUGH_METAL)
+        elif self.other_path:
+            # Depends on the previous path, so it isn't cached
+            path = pathfinding.breadth_first_search(start, goal, width, self.currentmap.height, self.get_other_path_passable())
+        else:
+            path = self.grid.find_path(start, goal, pathfinding.GRASS_AND_WOOD)
+        return deque(Vec2d(*pathfinding.unpack(index, width)) for index in path)
+
+    def find_weighted_path(self, target=None, deadline=None, in_process=False):
+        """
+        A weighted search, where wooden boxes cost the time needed to shoot them and
+        metal boxes the time needed to push them, so the best path is found in a single search.
+        The search is kept by the incremental planner of the goal on the grid, shared by all
+        the Ai heading there, so when boxes are destroyed or pushed only the affected part of
+        it is redone, and its paths go through the path cache of the grid.
+        If we are looking for another path, the tiles of the previous path are avoided.
+        Returns None if the deadline (time.perf_counter()) was reached before the search was done,
+        or if the path is still being searched by the process planner (unless in_process is set).
+        """
+        start, goal = self.get_search_tiles(target)
+        if goal is None:
+            return deque()
+        width = self.currentmap.width
+        path = None
+        if self.other_path:
+            # Depends on the previous path, so it isn't cached
+            path = pathfinding.a_star_search(start, goal, width, self.currentmap.height, self.get_other_path_costs())
+        if not path:
+            if self.process_planner is not None and not in_process:
+                path = self.process_planner.find_path(self, start, goal)
+            else:
+                path = self.grid.find_path(start, goal, pathfinding.WEIGHTED, deadline)
+            if path is None:
+                return None
+        return deque(Vec2d(*pathfinding.unpack(index, width)) for index in path)
 
     def get_target_tile(self):
         """
@@ -209,22 +416,17 @@ class Ai:
         """
         if self.tank.flag is not None:
             x, y = self.tank.start_position
-        elif self.target_tile is not None:          # If another tank has picked up the flag
-            closest = None
-            for cord in self.target_tile:           # Do shortest path for every Vec2d in target tank path
-                close = self.find_shortest_path(target=cord, second_try=True)
-                if closest is None:
-                    closest = close
-                elif len(closest) > len(close):     # Save the path to the closest point in target tank path
-                    closest = close
-
-                if cord == self.get_tile_of_position(self.grid_pos):        # Stop if we are on the path
-                    return self.target_tile[0]
-            else:
-                if len(closest) >= 1:               # Stops when we arrived at point
-                    return closest[-1]
-                else:
-                    return self.target_tile[0]
+        elif self.target_tile:          # If another tank has picked up the flag
+            if self.get_tile_of_position(self.grid_pos) in self.target_tile:           # Stop if we are on the path
+                return self.target_tile[0]
+            # The closest point in target tank path. The route is connected, so either all of it
+            # can be reached or none of it, and then we go to its first point.
+            coords = [cord.int_tuple for cord in self.target_tile]
+            if all(self.is_on_map(coord) for coord in coords):
+                closest = self.grid.closest_of(self.get_tile_of_position(self.tank.body.position).int_tuple, coords, pathfinding.THROUGH_METAL)
+                if closest is not None:
+                    return self.target_tile[closest]
+            return self.target_tile[0]
         else:
             self.get_flag()         # Ensure that we have initialized it.
             x, y = self.flag.x, self.flag.y
@@ -236,11 +438,7 @@ class Ai:
         where it is when the Ai object is initialized.
         """
         if self.flag is None:
-            # Find the flag in the game objects list
-            for obj in self.game_objects_list:
-                if isinstance(obj, gameobjects.Flag):
-                    self.flag = obj
-                    break
+            self.flag = self.game_objects.flag
         return self.flag
 
     def get_tile_of_position(self, position_vector):
@@ -250,43 +448,31 @@ class Ai:
         x, y = position_vector
         return Vec2d(int(x), int(y))
 
-    def get_tile_neighbors(self, coord_vec: Vec2d, second_try=False):
-        """
-        Returns all bordering grid squares of the input coordinate.
-        A bordering square is only considered accessible if it is grass
-        or a wooden box.
-        """
-        neighbors = [self.get_tile_of_position(coord_vec) + neighbour for neighbour in [(0, 1), (0, -1), (1, 0), (-1, 0)]]
-        if second_try:
-            return filter(self.filter_tile_neighbors_second, neighbors)
-        elif self.other_path:
-            return filter(self.filter_tile_neighbors_second_path, neighbors)
-        else:
-            return filter(self.filter_tile_neighbors, neighbors)
-
-    def filter_tile_neighbors(self, coord):
+    def is_on_map(self, coord):
         """
-        Used to filter the tile to check if it is a neighbor of the tank.
+        Checks if the coordinate is a tile of the map.
         """
-        return (0 <= coord[0] <= self.max_x) and (0 <= coord[1] <= self.max_y) and (self.currentmap.boxAt(coord[0], coord[1]) == 0 or self.currentmap.boxAt(coord[0], coord[1]) == 2)
+        return (0 <= coord[0] <= self.max_x) and (0 <= coord[1] <= self.max_y) and coord[0] == int(coord[0]) and coord[1] == int(coord[1])
 
-    def filter_tile_neighbors_second(self, coord):
+    def get_other_path_passable(self):
         """
-        Used to filter the tile to check if it is a neighbor of the tank. Metal boxes included.
+        Returns the flat passability list used to find another path than the previous one:
+        metal boxes are included, but not the tiles of the previous path.
         """
-        return (0 <= coord[0] <= self.max_x) and (0 <= coord[1] <= self.max_y) and (self.currentmap.boxAt(coord[0], coord[1]) == 0 or self.currentmap.boxAt(coord[0], coord[1]) == 2 or self.currentmap.boxAt(coord[0], coord[1]) == 3)
+        passable = list(self.grid.passable_flat[pathfinding.THROUGH_METAL])
+        for coord in list(self.previous_path)[:-1]:
+            passable[pathfinding.pack(int(coord[0]), int(coord[1]), self.currentmap.width)] = False
+        return passable
 
-    def filter_tile_neighbors_second_path(self, coord):
+    def get_other_path_costs(self):
         """
-        Used to filter the tile to check if it is a neighbor of the tank. Metal boxes included and if the tile is in shortest_path.
+        Returns the flat tile costs used by the weighted search to find another path
+        than the previous one: the tiles of the previous path can't be entered.
         """
-        # Check if coord is in shortest path
-        filter_path = True
-        for elem in range(len(self.previous_path) - 1):
-            if coord == self.previous_path[elem]:
-                filter_path = False
-        # Return cord if it filter_tile_neighbors_second is true and tile not in shortest_path
-        return self.filter_tile_neighbors_second(coord) and filter_path
+        costs = list(self.grid.costs_flat)
+        for coord in list(self.previous_path)[:-1]:
+            costs[pathfinding.pack(int(coord[0]), int(coord[1]), self.currentmap.width)] = None
+        return costs
 
     def turn(self, coord):
         """
@@ -0,0 +1,67 @@
+"""
+Measures how long a tick of the game takes, and how long the ray the ai cast to decide
+if they shoot takes, so a change meant to make them faster is measured against the code
+before it. The matches are played by the ai without any display and without a planning
+time budget, so the same ticks are measured every time.
+
+Example: python benchmark.py --maps map0 map1 --ticks 3000
+"""
+import argparse
+import math
+import time
+
+import ai
+import engine
+import tournament
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Measures how fast capture the flag is simulated')
+    parser.add_argument("--maps", metavar="", dest="maps", nargs="+", default=tournament.BUILTIN_MAPS, help="Maps to play, map0, map1, map2 or the file name of a json map, default is all the built in maps")
+    parser.add_argument("--ticks", metavar="", dest="ticks", type=int, default=3000, help="Number of ticks played on every map, default is %(default)s")
+    parser.add_argument("--legacy-bfs", dest="legacy_bfs", action="store_true", help="Makes the ai use the old breadth first search instead of the weighted A* search")
+    parser.add_argument("--merged-rocks", dest="merged_rocks", action="store_true", help="Makes the rocks a few large walls instead of one box per tile")
+    return parser.parse_args()
+
+
+def benchmark_map(map_name, ticks):
+    """
+    Plays ticks ticks on a map, and returns the seconds spent stepping the match and, after
+    every tick, casting the ray of every ai, with the number of rays cast. The ai only cast it
+    once their gun has reloaded, here it is cast on every tick so there are enough of them to time.
+    """
+    match = engine.Match(tournament.load_map(map_name), "normal", False, 0, math.inf)
+    step_time = 0.0
+    ray_time = 0.0
+    rays = 0
+    try:
+        for i in range(ticks):
+            start = time.perf_counter()
+            match.step()
+            step_time += time.perf_counter() - start
+            start = time.perf_counter()
+            for bot in match.ai_list:
+                bot.target_in_front()
+            ray_time += time.perf_counter() - start
+            rays += len(match.ai_list)
+    finally:
+        match.close()
+    return {"map": map_name, "ticks": ticks, "step_time": step_time, "ray_time": ray_time, "rays": rays}
+
+
+def print_results(results):
+    print("%-12s %7s %12s %9s %10s" % ("map", "ticks", "ms per tick", "ticks/s", "us per ray"))
+    for result in results:
+        print("%-12s %7d %12.3f %9.0f %10.2f" % (result["map"], result["ticks"], 1000 * result["step_time"] / result["ticks"],
+                                                 result["ticks"] / result["step_time"], 1e6 * result["ray_time"] / result["rays"]))
+
+
+def main():
+    args = parse_arguments()
+    ai.LEGACY_BFS = args.legacy_bfs
+    engine.MERGED_ROCKS = args.merged_rocks
+    print_results([benchmark_map(map_name, args.ticks) for map_name in args.maps])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,732 @@
+"""
+Simulation of a match, without any dependency on the display.
+A match owns the physics engine, the game objects, the ai and the win conditions,
+and advances the game one tick at a time when step is called. Drawing the match
+is done by the renderer module.
+"""
+import hashlib
+import random
+import struct
+import time
+import pymunk
+
+import ai
+import entities
+import images
+import gameobjects
+import kinematics
+import pathfinding
+
+# -- Constants
+FRAMERATE = 50
+POINTS_TO_WIN = 1
+GAME_TIME_LIMIT = FRAMERATE * 60 * 5  # 5 Minutes
+NUMBER_OF_ROUNDS_LIMIT = 10
+BULLET_COOLDOWN = 50
+BULLETS_PER_TANK = 4  # Number of bullets created in advance for every tank
+BATCHED_KINEMATICS = True  # Updates the tanks and bullets in one vectorized pass instead of one at a time
+# Covers the rock boxes with a few large static shapes instead of one body per tile. The
+# contacts at the seams and corners of the walls differ, so a match doesn't play out exactly
+# as with one body per tile, which is why it has to be asked for (--merged-rocks)
+MERGED_ROCKS = False
+
+
+class Simulation:
+    """
+    The physics of a match: the tanks, the boxes, the bullets and the flag, without the ai.
+    The tanks only do what they are told before step is called, which makes a simulation
+    a cheap copy of a match to play a few seconds ahead, for instance to compare moves.
+    """
+
+    def __init__(self, current_map, difficulty="normal"):
+        """
+        Takes as arguments the map and the selected difficulty.
+        """
+        self.current_map = current_map
+        self.difficulty = difficulty
+
+        # -- Initialise the physics engine
+        self.space = pymunk.Space()
+        self.space.gravity = (0.0, 0.0)
+        self.space.damping = 0.1  # Adds friction to the ground for all objects
+
+        # -- Variables
+        self.game_objects = entities.EntityRegistry()
+        self.tanks_list = []
+        self.boxes_list = []        # All the boxes created, in the same order in every simulation of the map
+        self.metal_boxes = {}       # The boxes that can be pushed but not destroyed -> the order they were created in
+        self.moving_boxes = set()   # The metal boxes that were moving after the last tick or have been hit by a bullet
+        self.total_game_time = 0
+        self.total_round_number = 0
+        self.skip_update = 0
+        self.bullet_tick = BULLET_COOLDOWN
+
+        # Runs all the initilazation functions
+        self.create_boundaries()
+        self.create_boxes()
+        self.create_tanks(difficulty)
+        self.bullet_pool = gameobjects.BulletPool(self.space, BULLETS_PER_TANK * len(self.tanks_list))
+        self.flag = self.create_flag()
+        self.create_collision_handlers()
+        self.start_snapshot = self.snapshot()  # The simulation as it is at the start of every round
+
+    # -- Creates the static lines (Map boundaries)
+    def create_boundaries(self):
+        """
+        Creates static lines in the form of pymunk.Segments that act as map boundaries
+        """
+        x = self.current_map.width
+        y = self.current_map.height
+        static_body = self.space.static_body
+        static_lines = [
+            pymunk.Segment(static_body, (0, 0), (x, 0), 0),
+            pymunk.Segment(static_body, (x, 0), (x, y), 0),
+            pymunk.Segment(static_body, (x, y), (0, y), 0),
+            pymunk.Segment(static_body, (0, y), (0, 0), 0)
+        ]
+        for line in static_lines:
+            line.elasticity = 0
+            line.friction = 1
+            line.collision_type = gameobjects.collision_types["boundry"]
+            self.space.add(line)
+
+    # -- Creates the boxes
+    def create_boxes(self):
+        """
+        Creates box obstacles based on map and adds to list of gameobjects.
+        Boxes take positional arguments and type from the maps.py file.
+        """
+        rocks = {}
+        for x in range(0, self.current_map.width):
+            for y in range(0, self.current_map.height):
+                # Get the type of boxes
+                box_type = self.current_map.boxAt(x, y)
+                # If the box type is not 0, create a box
+                if (box_type != 0):
+                    # Create a box using the box_type as well as the x, y coordinates
+                    # and pymunk space. The rock boxes stay out of the space when the
+                    # rock walls collide in their place.
+                    if MERGED_ROCKS and box_type == 1:
+                        box = gameobjects.get_box_with_type(x, y, box_type, None)
+                        rocks[box.tile] = box
+                    else:
+                        box = gameobjects.get_box_with_type(x, y, box_type, self.space)
+                    self.game_objects.add(box)
+                    self.boxes_list.append(box)
+                    if box.movable and not box.destructable:
+                        self.metal_boxes[box] = len(self.metal_boxes)
+        self.moving_boxes = set(self.metal_boxes)
+        if MERGED_ROCKS:
+            self.create_rock_walls(rocks)
+
+    def create_rock_walls(self, rocks):
+        """
+        Creates one static polygon per rectangle of rock tiles on the static body of the space.
+        rocks are the rock boxes by tile, the polygon of a rectangle belongs to the rock box
+        of its first tile, so the collision handlers see a box that can't be destroyed.
+        """
+        static_body = self.space.static_body
+        for x, y, width, height in self.current_map.rock_rectangles():
+            wall = pymunk.Poly(static_body, [(x, y), (x, y + height), (x + width, y + height), (x + width, y)])
+            wall.collision_type = gameobjects.collision_types["box"]
+            wall.parent = rocks[(x, y)]
+            self.space.add(wall)
+
+    # -- Create the tanks and the bases
+    def create_tanks(self, selected_difficulty):
+        """
+        Iterates over list of starting positions from maps.py and creates tanks and bases on the corresponding positions.
+        """
+        difficulty_modifier = 1
+        if selected_difficulty == "easy":
+            difficulty_modifier = 0.7
+        elif selected_difficulty == "hard":
+            difficulty_modifier = 1.3
+
+        # Loop over starting positions
+        for i in range(0, len(self.current_map.start_positions)):
+            # Get the starting position of the tank "i"
+            pos = self.current_map.start_positions[i]
+            # Create the tank, images.tanks contains the image of the tank
+            if i == 0:
+                tank = gameobjects.Tank(pos[0], pos[1], pos[2], images.tanks[i], self.space, i + 1, 1)
+            else:
+                tank = gameobjects.Tank(pos[0], pos[1], pos[2], images.tanks[i], self.space, i + 1, difficulty_modifier)
+            base = gameobjects.GameVisibleObject(pos[0], pos[1], images.bases[i])
+            # Adds the tank and base to lists
+            self.tanks_list.append(tank)
+            self.game_objects.add(base)
+            self.game_objects.add(tank)
+
+    # -- Create the flag
+    def create_flag(self):
+        """
+        Creates flag object at position given by maps.py.
+        """
+        flag = gameobjects.Flag(self.current_map.flag_position[0], self.current_map.flag_position[1])
+        self.game_objects.add(flag)
+        return flag
+
+    # --Collisions handlers
+    def create_collision_handlers(self):
+        """
+        Creates collision handlers for each type of collision interaction.
+        """
+        handler_bullet_tank = self.space.add_collision_handler(gameobjects.collision_types["bullet"], gameobjects.collision_types["tank"])
+        handler_bullet_box = self.space.add_collision_handler(gameobjects.collision_types["bullet"], gameobjects.collision_types["box"])
+        handler_bullet_boundry = self.space.add_collision_handler(gameobjects.collision_types["bullet"], gameobjects.collision_types["boundry"])
+        handler_bullet_tank.post_solve = self.collision_bullet_tank
+        handler_bullet_box.pre_solve = self.collision_bullet_box
+        handler_bullet_boundry.post_solve = self.collision_bullet_boundry
+
+    def remove_bullet(self, arb):
+        """
+        Removes the bullet of a collision and gives it back to the pool, if it has not already been removed.
+        """
+        bullet = arb.shapes[0].parent
+        if self.game_objects.remove(bullet):
+            self.bullet_pool.release(bullet)
+
+    # --Collision for bullet
+    def collision_bullet_tank(self, arb, space, data):
+        """
+        Handles collision between tanks and bullets and removes both.
+        """
+        # Drops the flag
+        if self.flag.is_on_tank:
+            self.flag.is_on_tank = False
+            arb.shapes[1].parent.flag = None
+
+        # Removes bullet
+        self.remove_bullet(arb)
+
+        # Moves tank to start_position
+        tank = arb.shapes[1].parent
+        tank.body.position = tank.start_position
+        tank.body.velocity = pymunk.Vec2d.zero()
+        tank.body.angular_velocity = 0
+        tank.rotation = 0
+        tank.body.angle = tank.start_angle
+        self.tank_hit(tank)
+        return True
+
+    def tank_hit(self, tank):
+        """
+        Called when a tank has been hit by a bullet and sent back to its start position.
+        """
+        return
+
+    def collision_bullet_box(self, arb, space, data):
+        """
+        Handles collision between bullets and boxes, removing bullet and removes box if destructible
+        """
+        # Remove bullet if bullet exists
+        self.remove_bullet(arb)
+        if arb.shapes[1].parent in self.metal_boxes:
+            self.moving_boxes.add(arb.shapes[1].parent)
+        # Remove box if destructable
+        if arb.shapes[1].parent.destructable:
+            self.space.remove(arb.shapes[1], arb.shapes[1].body)
+            self.game_objects.remove(arb.shapes[1].parent)
+            self.box_destroyed(arb.shapes[1].parent)
+        return True
+
+    def box_destroyed(self, box):
+        """
+        Called when a wooden box has been destroyed by a bullet.
+        """
+        return
+
+    def collision_bullet_boundry(self, arb, space, data):
+        """
+        Handles collision between bullet and map boundry, removing the bullet upon impact.
+        """
+        self.remove_bullet(arb)
+
+    def update_pushed_boxes(self):
+        """
+        Called after the objects have moved, only the ai need to know which tiles the pushed boxes are on.
+        """
+        return
+
+    def touched_metal_boxes(self, body):
+        """
+        Returns the metal boxes in contact with a body.
+        """
+        boxes = []
+        body.each_arbiter(self.collect_metal_boxes, boxes)
+        return boxes
+
+    def collect_metal_boxes(self, arbiter, boxes):
+        for shape in arbiter.shapes:
+            box = getattr(shape, "parent", None)
+            if box in self.metal_boxes:
+                boxes.append(box)
+
+    def snapshot(self):
+        """
+        Returns the state of the bodies of the tanks and the movable boxes and of the flag,
+        to be given to restore.
+        """
+        return {
+            "tanks": [(tank, body_state(tank.body)) for tank in self.tanks_list],
+            "boxes": {box: (body_state(box.body), box.tile) for box in self.game_objects.boxes if box.movable},
+            "flag": (self.flag.x, self.flag.y, self.flag.orientation),
+        }
+
+    def restore(self, snapshot):
+        """
+        Puts the tanks, the flag and the boxes back to the state they were in when snapshot
+        was taken, reusing their bodies. Destroyed boxes are put back in the space.
+        """
+        # Resets all the tanks
+        for tank, state in snapshot["tanks"]:
+            restore_body(tank.body, state)
+            tank.flag = None
+        # Resets the flag
+        self.flag.is_on_tank = False
+        self.flag.x, self.flag.y, self.flag.orientation = snapshot["flag"]
+        # Puts back the boxes that have been destroyed or pushed. The rock boxes can't be
+        # destroyed or moved, so they are left as they are.
+        for box in [box for box in self.game_objects.boxes if box.movable and box not in snapshot["boxes"]]:
+            # The box had already been destroyed when the snapshot was taken
+            self.space.remove(box.body, box.shape)
+            self.game_objects.remove(box)
+        for box, (state, tile) in snapshot["boxes"].items():
+            if box not in self.game_objects:
+                self.space.add(box.body, box.shape)
+                self.game_objects.add(box)
+            # Setting the state of a body is slow, so the boxes that haven't moved are skipped
+            if body_state(box.body) != state:
+                restore_body(box.body, state)
+            box.tile = tile
+        # The boxes may have been put back anywhere, their tiles are all checked on the next tick
+        self.moving_boxes = set(self.metal_boxes)
+
+    def reset_round(self):
+        """
+        Puts the tanks, the flag and the boxes back to where they were at the start of the match.
+        """
+        self.restore(self.start_snapshot)
+
+    def check_win_conditions(self):
+        """
+        Checks if win conditions have been achieved
+        """
+        # Checks if someone has won by points
+        for tank in self.tanks_list:
+            if tank.score == POINTS_TO_WIN:
+                return True
+
+        # Checks if time limit is reached
+        if self.total_game_time > GAME_TIME_LIMIT:
+            return True
+
+        # Checks if round limit is reached
+        if self.total_round_number == NUMBER_OF_ROUNDS_LIMIT:
+            return True
+        return False
+
+    def shoot(self, tank):
+        """
+        Makes a tank shoot, and returns the bullet.
+        """
+        bullet = tank.shoot(self.space, self.bullet_pool)
+        self.game_objects.add(bullet)
+        return bullet
+
+    def control_tanks(self):
+        """
+        Called during every tick, before the physics update, to give commands to the tanks.
+        """
+        return
+
+    def step(self):
+        """
+        Advances the simulation by one tick.
+        Returns "score" if a round was won during the tick, "victory" if the game is over, and otherwise None.
+        """
+        result = None
+
+        # Cooldown for bullet
+        if (self.bullet_tick != BULLET_COOLDOWN):
+            self.bullet_tick += 1
+
+        # -- Loops through tanks_list
+        for tank in self.tanks_list:
+            # Tries to grab the flag
+            tank.try_grab_flag(self.flag)
+            # Checks if the tank has won
+            if tank.has_won():
+                tank.score += 1
+                self.reset_round()
+                self.total_round_number += 1
+                result = "score"
+
+        self.control_tanks()
+
+        # --Update physics
+        if self.skip_update == 0:
+            # Update the speed of the tanks and bullets in function of their acceleration,
+            # the other objects don't move by themselves.
+            if BATCHED_KINEMATICS:
+                kinematics.update_objects(self.game_objects.tanks, self.game_objects.bullets)
+            else:
+                for obj in self.game_objects.tanks:
+                    obj.update()
+                for obj in self.game_objects.bullets:
+                    obj.update()
+            self.skip_update = 2
+        else:
+            self.skip_update -= 1
+
+        # Check collisions and update the objects position
+        self.space.step(1 / FRAMERATE)
+        self.update_pushed_boxes()
+
+        # Update object that depends on an other object position, only the tanks carry an other object (the flag)
+        for obj in self.game_objects.tanks:
+            obj.post_update()
+
+        # Updates the total game time
+        self.total_game_time += 1
+
+        # Checks if someone has won the game
+        if self.check_win_conditions():
+            result = "victory"
+
+        # The next round starts with a fresh physics update and a loaded gun
+        if result is not None:
+            self.skip_update = 0
+            self.bullet_tick = BULLET_COOLDOWN
+        return result
+
+    def copy_state(self, other):
+        """
+        Puts this simulation in the state of other, a simulation or a match on the same map,
+        reusing the bodies this simulation already has.
+        """
+        self.total_game_time = other.total_game_time
+        self.total_round_number = other.total_round_number
+        self.skip_update = other.skip_update
+        self.bullet_tick = other.bullet_tick
+
+        for tank, other_tank in zip(self.tanks_list, other.tanks_list):
+            restore_body(tank.body, body_state(other_tank.body))
+            tank.acceleration = other_tank.acceleration
+            tank.rotation = other_tank.rotation
+            tank.max_speed = other_tank.max_speed
+            tank.score = other_tank.score
+            tank.flag = self.flag if other_tank.flag is not None else None
+        self.flag.x, self.flag.y, self.flag.orientation = other.flag.x, other.flag.y, other.flag.orientation
+        self.flag.is_on_tank = other.flag.is_on_tank
+        self.flag.tank_start_pos = other.flag.tank_start_pos
+
+        # The boxes are matched by the order they were created in, the rock boxes never change
+        for box, other_box in zip(self.boxes_list, other.boxes_list):
+            if not box.movable:
+                continue
+            if other_box not in other.game_objects:
+                if box in self.game_objects:
+                    self.space.remove(box.body, box.shape)
+                    self.game_objects.remove(box)
+                continue
+            if box not in self.game_objects:
+                self.space.add(box.body, box.shape)
+                self.game_objects.add(box)
+            state = body_state(other_box.body)
+            if body_state(box.body) != state:
+                restore_body(box.body, state)
+            box.tile = other_box.tile
+        self.moving_boxes = set(self.metal_boxes)
+
+        # The bullets are shot again from the pool
+        for bullet in list(self.game_objects.bullets):
+            self.game_objects.remove(bullet)
+            self.bullet_pool.release(bullet)
+        for other_bullet in other.game_objects.bullets:
+            bullet = self.bullet_pool.acquire(0, 0, 0)
+            restore_body(bullet.body, body_state(other_bullet.body))
+            self.game_objects.add(bullet)
+
+    def clone(self):
+        """
+        Returns a new simulation in the same state as this one. A match is cloned without its ai.
+        pymunk doesn't let the contacts between the bodies be copied, so a clone of objects that
+        are touching doesn't move exactly like the original, which is good enough to compare moves.
+        To do many rollouts, copy_state is cheaper than cloning again.
+        """
+        simulation = Simulation(self.current_map, self.difficulty)
+        simulation.copy_state(self)
+        return simulation
+
+    def rollout(self, ticks, policy=None):
+        """
+        Steps the simulation for at most ticks ticks, or until someone has won the game.
+        policy is called with the simulation before every tick, to give commands to the tanks.
+        Returns the number of ticks done and the result of the last one.
+        """
+        result = None
+        for tick in range(ticks):
+            if policy is not None:
+                policy(self)
+            result = self.step()
+            if result == "victory":
+                return tick + 1, result
+        return ticks, result
+
+    def state_hash(self):
+        """
+        Returns a hash of the positions and velocities of everything that moves, the scores
+        and the flag, to check that two simulations of a match are in the same state.
+        """
+        values = [self.total_game_time, self.total_round_number, self.flag.x, self.flag.y, self.flag.is_on_tank]
+        for tank in self.tanks_list:
+            values.extend((tank.score, tank.flag is not None, tank.body.angle, tank.body.angular_velocity))
+            values.extend(tank.body.position)
+            values.extend(tank.body.velocity)
+        for view in (self.game_objects.bullets, self.game_objects.boxes):
+            for obj in view:
+                values.append(obj.body.angle)
+                values.extend(obj.body.position)
+        return hashlib.blake2b(struct.pack("<%dd" % len(values), *values), digest_size=8).digest()
+
+
+class Match(Simulation):
+    """
+    A match on one map, from the first tick until someone has won the game.
+    """
+
+    def __init__(self, current_map, difficulty="normal", player=True, planner_processes=0, planning_budget=ai.PLANNING_BUDGET, seed=None):
+        """
+        Takes as arguments the map, the selected difficulty, whether the first tank is
+        controlled by a player (otherwise its ai drives it), the number of processes the
+        ai use to search paths, the milliseconds per tick they may spend on it and the
+        seed of the random numbers drawn by the ai. Without a seed the ai don't draw any.
+        """
+        self.player = player
+        self.seed = seed
+        # Every match has its own generator, so matches played in the same process don't change each other
+        self.random = random.Random(seed) if seed is not None else None
+
+        self.ai_list = []
+        self.commands = []          # (Tank index, command) given to the tanks since the last tick
+        self.input_commands = []    # Commands given before the last tick started, by the player
+        self.ai_commands = []       # Commands given during the last tick, by the ai
+        self.replayed_commands = None  # Commands given to the tanks instead of running the ai
+        self.recorder = None        # Called after every tick, to record the match
+
+        # The grid is part of the snapshots of the match, so it exists before the simulation
+        self.grid = pathfinding.Grid(current_map)
+        super().__init__(current_map, difficulty)
+        self.flag_route = ai.FlagRoute(self.grid)
+        self.planning_scheduler = ai.PlanningScheduler(planning_budget)
+        self.process_planner = None
+        if planner_processes > 0:
+            self.process_planner = pathfinding.ProcessPlanner(self.grid, planner_processes)
+        self.create_ai()
+
+    def create_ai(self):
+        """
+        Creates Ai objects for all the tanks.
+        """
+        for tank in self.tanks_list:
+            tank.command_log = self.log_command
+            bot = ai.Ai(tank, self.game_objects, self.tanks_list, self.space, self.current_map, self.grid,
+                        self.planning_scheduler, self.process_planner, self.random)
+            self.ai_list.append(bot)
+
+    def tank_hit(self, tank):
+        """
+        Changes the target of the ai, since a tank is back at its start position.
+        """
+        self.flag_route.clear()
+        for bot in self.ai_list:
+            bot.target_tile = None
+            bot.forced_reset = True
+
+    def box_destroyed(self, box):
+        """
+        The Ai can no longer use the cached paths.
+        """
+        self.grid.remove_box(box.tile)
+
+    def update_pushed_boxes(self):
+        """
+        Moves the metal boxes that have been pushed out of their tile on the grid used by the Ai.
+        """
+        # A box standing still only starts moving when something that moves pushes it, so only
+        # the boxes that were moving, hit by a bullet or touching a tank or a moving box are checked
+        checked = set(self.moving_boxes)
+        for tank in self.tanks_list:
+            checked.update(self.touched_metal_boxes(tank.body))
+        pending = list(checked)
+        moving = set()
+        while pending:
+            box = pending.pop()
+            if box.body.is_sleeping or box.body.velocity == pymunk.Vec2d.zero():
+                continue
+            moving.add(box)
+            for other in self.touched_metal_boxes(box.body):
+                if other not in checked:
+                    checked.add(other)
+                    pending.append(other)
+        self.moving_boxes = moving
+        for box in sorted(checked, key=self.metal_boxes.get):
+            left_tile = box.update_tile()
+            if left_tile is not None:
+                self.grid.move_metal_box(left_tile, box.tile)
+
+    def snapshot(self):
+        """
+        Returns the state of the bodies of the tanks and the movable boxes, the flag and
+        the grid of the ai, to be given to restore.
+        """
+        snapshot = super().snapshot()
+        snapshot["grid"] = self.grid.snapshot()
+        return snapshot
+
+    def restore(self, snapshot):
+        """
+        Puts the match back to the state it was in when snapshot was taken, and resets the ai.
+        """
+        super().restore(snapshot)
+        self.grid.restore(snapshot["grid"])
+        # Resets ai
+        self.flag_route.clear()
+        for bot in self.ai_list:
+            bot.forced_reset = True
+            bot.target_tile = None
+            bot.other_path = False
+            if self.random is not None:
+                bot.bullet_tick = bot.start_bullet_tick()
+
+    def player_shoot(self):
+        """
+        Makes the tank of the player shoot, if its bullet has cooled down.
+        """
+        if self.bullet_tick == BULLET_COOLDOWN:
+            self.game_objects.add(self.tanks_list[0].shoot(self.space, self.bullet_pool))
+            self.bullet_tick = 0
+
+    def log_command(self, tank, command):
+        """
+        Keeps the commands given to the tanks, so they can be recorded.
+        """
+        self.commands.append((tank.player_number - 1, command))
+
+    def apply_command(self, tank_index, command):
+        """
+        Gives a recorded command to a tank.
+        """
+        tank = self.tanks_list[tank_index]
+        if command == "shoot":
+            self.shoot(tank)
+        else:
+            getattr(tank, command)()
+
+    def run_ai(self):
+        """
+        Lets the ai decide what their tanks do and shoot.
+        """
+        # --Loops through ai_list, in the order the ai get to search for paths
+        for bot in self.planning_scheduler.begin_tick(self.ai_list):
+            # Calls decide function for each ai instance and ignores player
+            if not (self.player and bot.tank == self.tanks_list[0]):
+                bot.decide()
+            # Makes the ai shoot
+            if bot.has_fired:
+                bot.has_fired = False
+                self.shoot(bot.tank)
+            # Publishes the route of the flag carrier, only when it has changed
+            if bot.tank.flag is not None and self.flag_route.update(bot):
+                for other_bot in self.ai_list:
+                    other_bot.target_tile = self.flag_route.tiles
+
+    def control_tanks(self):
+        """
+        Runs the ai, or gives the tanks the commands the ai gave them when the match was recorded.
+        """
+        if self.replayed_commands is None:
+            self.run_ai()
+        else:
+            for tank_index, command in self.replayed_commands:
+                self.apply_command(tank_index, command)
+
+    def step(self, ai_commands=None):
+        """
+        Advances the match by one tick. If ai_commands is given, the ai don't decide and
+        the recorded commands are given to the tanks instead.
+        Returns "score" if a round was won during the tick, "victory" if the game is over, and otherwise None.
+        """
+        self.input_commands = self.commands
+        self.commands = []
+
+        self.replayed_commands = ai_commands
+        result = super().step()
+        self.replayed_commands = None
+
+        self.ai_commands = self.commands
+        self.commands = []
+        if self.recorder is not None:
+            self.recorder.record_tick(self)
+        return result
+
+    def statistics(self, wall_time, ticks):
+        """
+        Returns the scores of the match, together with how fast the given number of ticks were simulated.
+        """
+        return {
+            "ticks": self.total_game_time,
+            "rounds": self.total_round_number,
+            "scores": [tank.score for tank in self.tanks_list],
+            "wall_time": wall_time,
+            "ticks_per_second": ticks / wall_time if wall_time > 0 else 0.0,
+            "bullet_pool": self.bullet_pool.stats(),
+            "path_cache": self.grid.path_cache.stats(),
+        }
+
+    def close(self):
+        """
+        Stops the processes used to search paths, if any, and closes the recording of the match.
+        """
+        if self.recorder is not None:
+            self.recorder.close(self)
+        if self.process_planner is not None:
+            self.process_planner.close()
+            self.process_planner = None
+
+
+def fast_forward(match, on_tick=None):
+    """
+    Steps the match as fast as possible, instead of at the framerate of the game, until
+    someone has won the game or on_tick returns True. on_tick is called after every tick,
+    for instance to draw the match. Returns the statistics of the match.
+    """
+    start_ticks = match.total_game_time
+    start_time = time.perf_counter()
+    while True:
+        result = match.step()
+        if on_tick is not None and on_tick():
+            break
+        if result == "victory":
+            break
+    return match.statistics(time.perf_counter() - start_time, match.total_game_time - start_ticks)
+
+
+def body_state(body):
+    """
+    Returns the position, angle and velocities of a pymunk body.
+    """
+    return (body.position, body.angle, body.velocity, body.angular_velocity)
+
+
+def restore_body(body, state):
+    """
+    Puts a pymunk body back in a state returned by body_state.
+    """
+    body.position, body.angle, body.velocity, body.angular_velocity = state
+    body.force = pymunk.Vec2d.zero()
+    body.torque = 0
+    # Integrating over no time only clears the bias velocities the solver left on the body
+    pymunk.Body.update_position(body, 0)
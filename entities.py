@@ -0,0 +1,82 @@
+"""
+Keeps track of the game objects of a match.
+"""
+import gameobjects
+
+# The view every type of game object is kept in
+VIEWS = {
+    gameobjects.Tank: "tanks",
+    gameobjects.Bullet: "bullets",
+    gameobjects.Box: "boxes",
+    gameobjects.Flag: "flags",
+    gameobjects.GameVisibleObject: "bases",
+}
+
+
+class EntityRegistry:
+    """
+    Stores the game objects by id, so adding and removing one doesn't have to scan
+    all of them, together with one view per type of game object (tanks, bullets,
+    boxes, flags and bases). Iterating the registry or a view returns the objects
+    in the order they were added.
+    """
+
+    def __init__(self):
+        self.entities = {}  # Id of the object -> object, for all the objects
+        self.views = {name: {} for name in VIEWS.values()}
+        self.views["others"] = {}
+
+    def add(self, obj):
+        """
+        Adds a game object, and returns it.
+        """
+        key = id(obj)
+        self.entities[key] = obj
+        self.views[VIEWS.get(type(obj), "others")][key] = obj
+        return obj
+
+    def remove(self, obj):
+        """
+        Removes a game object. Returns False if it had already been removed.
+        """
+        key = id(obj)
+        if self.entities.pop(key, None) is None:
+            return False
+        del self.views[VIEWS.get(type(obj), "others")][key]
+        return True
+
+    def __contains__(self, obj):
+        return id(obj) in self.entities
+
+    def __iter__(self):
+        return iter(self.entities.values())
+
+    def __len__(self):
+        return len(self.entities)
+
+    @property
+    def tanks(self):
+        return self.views["tanks"].values()
+
+    @property
+    def bullets(self):
+        return self.views["bullets"].values()
+
+    @property
+    def boxes(self):
+        return self.views["boxes"].values()
+
+    @property
+    def flags(self):
+        return self.views["flags"].values()
+
+    @property
+    def bases(self):
+        return self.views["bases"].values()
+
+    @property
+    def flag(self):
+        """
+        Returns the flag of the match, or None if it hasn't been created yet.
+        """
+        return next(iter(self.views["flags"].values()), None)
@@ -43,6 +43,10 @@ class GameObject:
         Sets the sprite of the gameobject. All gameobjects should have a sprite.
         """
         self.sprite = sprite
+        # The rotated sprite drawn last, which is drawn again as long as the object doesn't turn
+        self.drawn_orientation = None
+        self.drawn_sprite = None
+        self.drawn_offset = None
 
     def update(self):
         """
@@ -58,23 +62,31 @@ class GameObject:
         """
         return
 
-    def update_screen(self, screen):
+    def screen_sprite(self):
         """
-        Updates the visual part of the game. Should NOT need to be changed
-        by a subclass.
+        Returns the sprite of the object, rotated as the object is, and the position of
+        its top left corner on the screen.
         """
-        sprite = self.sprite
-
         p = self.screen_position()  # Get the position of the object (pygame coordinates)
-        sprite = pygame.transform.rotate(sprite, self.screen_orientation())  # Rotate the sprite using the rotation of the object
+        orientation = self.screen_orientation()
+        if orientation != self.drawn_orientation:
+            # Rotate the sprite using the rotation of the object
+            self.drawn_sprite, self.drawn_offset = images.rotated(self.sprite, orientation)
+            self.drawn_orientation = orientation
 
         # The position of the screen correspond to the center of the object,
         # but the function screen.blit expect to receive the top left corner
         # as argument, so we need to adjust the position p with an offset
         # which is the vector between the center of the sprite and the top left
         # corner of the sprite
-        offset = pymunk.Vec2d(*sprite.get_size()) / 2.
-        p = p - offset
+        return self.drawn_sprite, p - self.drawn_offset
+
+    def update_screen(self, screen):
+        """
+        Updates the visual part of the game. Should NOT need to be changed
+        by a subclass.
+        """
+        sprite, p = self.screen_sprite()
         screen.blit(sprite, p)  # Copy the sprite on the screen
 
 
@@ -89,7 +101,8 @@ class GamePhysicsObject(GameObject):
         """
         Takes as parameters the starting coordinate (x,y), the orientation, the sprite (aka the image
         representing the object), the physic engine object (space) and whether the object can be
-        moved (movable).
+        moved (movable). If space is None, the object isn't added to the physic engine, but its
+        shape can still be used for queries.
         """
 
         super().__init__(sprite)
@@ -122,7 +135,10 @@ class GamePhysicsObject(GameObject):
         self.shape.parent = self
 
         # Add the object to the physic engine
-        space.add(self.body, self.shape)
+        if space is not None:
+            space.add(self.body, self.shape)
+        else:
+            self.shape.cache_bb()
 
     def screen_position(self):
         """
@@ -183,17 +199,27 @@ class Tank(GamePhysicsObject):
         self.circle = []
         self.score = 0
         self.player_number = player_number
+        self.command_log = None  # Called with every command given to the tank, when the match is recorded
+
+    def log_command(self, command):
+        """
+        Passes the name of a command given to the tank to command_log, if there is one.
+        """
+        if self.command_log is not None:
+            self.command_log(self, command)
 
     def accelerate(self):
         """
         Call this function to make the tank move forward.
         """
+        self.log_command("accelerate")
         self.acceleration = modifier
 
     def stop_moving(self):
         """
         Call this function to make the tank stop moving.
         """
+        self.log_command("stop_moving")
         self.acceleration = 0
         self.body.velocity = pymunk.Vec2d.zero()
 
@@ -201,24 +227,28 @@ class Tank(GamePhysicsObject):
         """
         Call this function to make the tank move backward.
         """
+        self.log_command("decelerate")
         self.acceleration = -1
 
     def turn_left(self):
         """
         Makes the tank turn left (counter clock-wise).
         """
+        self.log_command("turn_left")
         self.rotation = -1
 
     def turn_right(self):
         """
         Makes the tank turn right (clock-wise).
         """
+        self.log_command("turn_right")
         self.rotation = 1
 
     def stop_turning(self):
         """
         Call this function to make the tank stop turning.
         """
+        self.log_command("stop_turning")
         self.rotation = 0
         self.body.angular_velocity = 0
 
@@ -275,10 +305,13 @@ class Tank(GamePhysicsObject):
         """
         return self.flag is not None and (self.start_position - self.body.position).length < 0.2
 
-    def shoot(self, space):
+    def shoot(self, space, bullet_pool=None):
         """
-        Call this function to shoot a missile.
+        Call this function to shoot a missile. The bullet is taken from bullet_pool if one is given.
         """
+        self.log_command("shoot")
+        if bullet_pool is not None:
+            return bullet_pool.acquire(self.body.position[0], self.body.position[1], self.body.angle)
         bullet = Bullet(self.body.position[0], self.body.position[1], 0, images.bullet, space, self.body.angle)
         return bullet
 
@@ -298,6 +331,20 @@ class Bullet(GamePhysicsObject):
         self.body.position = pymunk.Vec2d(x, y) + pymunk.Vec2d(1.8 * self.sprite.get_height() / images.TILE_SIZE, 0).rotated(self.body.angle + math.pi / 2)
         self.shape.collision_type = collision_types["bullet"]
 
+    def reuse(self, x, y, rotation):
+        """
+        Puts a bullet that has been removed from the space back in the state of a newly
+        shot bullet, fired from (x, y) in the direction rotation.
+        """
+        self.body.velocity = pymunk.Vec2d.zero()
+        self.body.angular_velocity = 0
+        self.body.force = pymunk.Vec2d.zero()
+        self.body.torque = 0
+        # Integrating over no time only clears the bias velocities the solver left on the body
+        pymunk.Body.update_position(self.body, 0)
+        self.body.angle = rotation
+        self.body.position = pymunk.Vec2d(x, y) + pymunk.Vec2d(1.8 * self.sprite.get_height() / images.TILE_SIZE, 0).rotated(self.body.angle + math.pi / 2)
+
     def update(self):
         """
         Updates Bullet object
@@ -306,6 +353,80 @@ class Bullet(GamePhysicsObject):
         return
 
 
+class BulletPool:
+    """
+    Keeps the bullets that have hit something outside of the space, so shooting reuses
+    their body and shape instead of creating new ones.
+    """
+
+    def __init__(self, space, size):
+        """
+        Takes as arguments the physic engine object (space) and how many bullets to create in advance (size).
+        """
+        self.space = space
+        self.free = []
+        self.size = 0           # Number of bullets created by the pool
+        self.active = 0         # Number of bullets currently in the space
+        self.peak_active = 0    # Highest number of bullets that have been in the space at the same time
+        self.fired = 0          # Number of bullets taken from the pool
+        self.exhausted = 0      # Number of times the pool was empty and a new bullet had to be created
+        for i in range(size):
+            self.free.append(self.create_bullet())
+
+    def create_bullet(self):
+        """
+        Creates a bullet which is not in the space.
+        """
+        # The bullet is created in a space of its own, adding it to the space of the game
+        # would change the ids the space gives to the shapes added after it
+        parking_space = pymunk.Space()
+        bullet = Bullet(0, 0, 0, images.bullet, parking_space, 0)
+        parking_space.remove(bullet.shape, bullet.body)
+        self.size += 1
+        return bullet
+
+    def acquire(self, x, y, rotation):
+        """
+        Returns a bullet fired from (x, y) in the direction rotation, and adds it to the space.
+        """
+        if self.free:
+            bullet = self.free.pop()
+        else:
+            self.exhausted += 1
+            bullet = self.create_bullet()
+        # Like a new bullet, it enters the space at (x, y) and is then moved in front of the tank,
+        # otherwise the spatial index of the space is built differently and the collisions are
+        # solved in another order
+        bullet.body.position = x, y
+        bullet.body.angle = 0
+        self.space.add(bullet.body, bullet.shape)
+        bullet.reuse(x, y, rotation)
+        self.fired += 1
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        return bullet
+
+    def release(self, bullet):
+        """
+        Removes a bullet from the space and keeps it until it is shot again.
+        """
+        self.space.remove(bullet.shape, bullet.body)
+        self.free.append(bullet)
+        self.active -= 1
+
+    def stats(self):
+        """
+        Returns the size of the pool and how it has been used.
+        """
+        return {
+            "size": self.size,
+            "active": self.active,
+            "peak_active": self.peak_active,
+            "fired": self.fired,
+            "exhausted": self.exhausted
+        }
+
+
 class Box(GamePhysicsObject):
     """
     This class extends the GamePhysicsObject to handle box objects.
@@ -316,8 +437,23 @@ class Box(GamePhysicsObject):
         It takes as arguments the coordinate of the starting position of the box (x,y) and the box model (boxmodel).
         """
         super().__init__(x, y, 0, sprite, space, movable)
+        self.movable = movable
         self.destructable = destructable
         self.shape.collision_type = collision_types["box"]
+        self.tile = (int(x), int(y))  # The tile the box is standing on
+
+    def update_tile(self):
+        """
+        Updates the tile the box is standing on, after it has been pushed.
+        Returns the tile it left, or None if it is still on the same tile.
+        """
+        x, y = self.body.position
+        tile = (int(x), int(y))
+        if tile == self.tile:
+            return None
+        left_tile = self.tile
+        self.tile = tile
+        return left_tile
 
 
 def get_box_with_type(x, y, type, space):
@@ -3,6 +3,7 @@ Graphics assests for the game
 """
 import pygame
 import os
+from collections import OrderedDict
 
 # Sets the main directory
 main_dir = os.path.split(os.path.abspath(__file__))[0]
@@ -15,10 +16,16 @@ def load_image(file):
         surface = pygame.image.load(file)
     except pygame.error:
         raise SystemExit('Could not load image "%s" %s' % (file, pygame.get_error()))
+    # Without a display (for instance when matches are simulated on a server) the
+    # image can not be converted, it is then converted by convert_images later
+    if pygame.display.get_surface() is None:
+        return surface
     return surface.convert_alpha()
 
 
 TILE_SIZE = 40  # Define the default size of tiles
+ROTATION_STEP = 1  # Degrees between two rotations of a sprite that are drawn differently
+ROTATION_CACHE_SIZE = 1024  # Rotated sprites kept, the least recently used one is dropped first
 
 explosion = load_image('explosion.png')  # Image of an explosion
 
@@ -48,3 +55,54 @@ tanks = [load_image('tank_orange.png'), load_image('tank_blue.png'), load_image(
 # List of image of bases corresponding to the color of each tank
 bases = [load_image('base_orange.png'), load_image('base_blue.png'), load_image('base_white.png'),
          load_image('base_yellow.png'), load_image('base_red.png'), load_image('base_gray.png')]
+
+
+def convert_images():
+    """
+    Converts the images to the pixel format of the display, which makes drawing them faster.
+    Has to be called once the display has been initialised.
+    """
+    global explosion, grass, rockbox, metalbox, woodbox, flag, crown, title, bullet, tanks, bases
+    explosion = explosion.convert_alpha()
+    grass = grass.convert_alpha()
+    rockbox = rockbox.convert_alpha()
+    metalbox = metalbox.convert_alpha()
+    woodbox = woodbox.convert_alpha()
+    flag = flag.convert_alpha()
+    crown = crown.convert_alpha()
+    title = title.convert_alpha()
+    bullet = bullet.convert_alpha()
+    tanks = [tank.convert_alpha() for tank in tanks]
+    bases = [base.convert_alpha() for base in bases]
+
+
+def sprite_list():
+    """
+    Returns the sprites of the game objects, always in the same order, so another
+    process can tell which sprite an object is drawn with from its index.
+    """
+    return [rockbox, metalbox, woodbox, flag, bullet] + tanks + bases
+
+
+# (Sprite, rotation step) -> rotated sprite and the offset from its center to its top left corner
+rotation_cache = OrderedDict()
+
+
+def rotated(sprite, angle):
+    """
+    Returns sprite rotated by angle degrees, rounded to a multiple of ROTATION_STEP, and half its
+    size, which is the offset from the center of the rotated sprite to its top left corner.
+    Rotating allocates a new surface, so the rotated sprites are cached.
+    """
+    step = round(angle / ROTATION_STEP) % (360 // ROTATION_STEP)
+    key = (sprite, step)
+    entry = rotation_cache.get(key)
+    if entry is not None:
+        rotation_cache.move_to_end(key)
+        return entry
+    surface = pygame.transform.rotate(sprite, step * ROTATION_STEP)
+    entry = (surface, (surface.get_width() / 2., surface.get_height() / 2.))
+    rotation_cache[key] = entry
+    if len(rotation_cache) > ROTATION_CACHE_SIZE:
+        rotation_cache.popitem(last=False)
+    return entry
@@ -0,0 +1,76 @@
+"""
+Updates the velocities of all the tanks and bullets at once.
+Does the same computations as Tank.update and Bullet.update, but on numpy arrays
+holding the angles and velocities of all the objects instead of one pymunk.Vec2d
+at a time. The order of the floating point operations is kept the same, so the
+results are exactly those of the per object updates.
+"""
+import math
+import numpy
+import gameobjects
+
+# numpy.arctan2 and numpy.square may differ in the last bit from math.atan2 and the
+# x ** 2 of python floats used by pymunk.Vec2d, which is enough for a match to end
+# differently. numpy.float_power calls the same pow as python, and math.atan2 is
+# applied to the arrays.
+atan2 = numpy.frompyfunc(math.atan2, 2, 1)
+
+
+def update_objects(tanks, bullets):
+    """
+    Updates the speed of the tanks and the bullets in function of their acceleration.
+    """
+    if tanks:
+        update_tanks(list(tanks))
+    if bullets:
+        update_bullets(list(bullets))
+
+
+def update_tanks(tanks):
+    """
+    Vectorized version of Tank.update.
+    """
+    angle = numpy.array([tank.body.angle for tank in tanks])
+    velocity = numpy.array([tuple(tank.body.velocity) for tank in tanks])
+    angular_velocity = numpy.array([tank.body.angular_velocity for tank in tanks])
+    acceleration = numpy.array([tank.acceleration for tank in tanks], dtype=float)
+    rotation = numpy.array([tank.rotation for tank in tanks], dtype=float)
+    max_speed = numpy.array([tank.max_speed for tank in tanks], dtype=float)
+
+    # Applies the vector in the direction we want accelerate / decelerate to our velocity
+    push = gameobjects.Tank.ACCELERATION * acceleration
+    cos = numpy.cos(angle)
+    sin = numpy.sin(angle)
+    vx = velocity[:, 0] + (0 * cos - push * sin)
+    vy = velocity[:, 1] + (0 * sin + push * cos)
+
+    # Makes sure that we dont exceed our speed limit
+    length_sqrd = numpy.float_power(vx, 2) + numpy.float_power(vy, 2)
+    speed = numpy.minimum(numpy.maximum(-max_speed, numpy.sqrt(length_sqrd)), max_speed)
+    direction = numpy.where(length_sqrd == 0, 0.0, atan2(vy, vx).astype(float))
+    cos = numpy.cos(direction)
+    sin = numpy.sin(direction)
+    vx = speed * cos - 0 * sin
+    vy = speed * sin + 0 * cos
+
+    # Updates the rotation
+    angular_velocity = angular_velocity + rotation * gameobjects.Tank.ACCELERATION
+    angular_velocity = numpy.minimum(numpy.maximum(-max_speed, angular_velocity), max_speed)
+
+    for tank, x, y, w in zip(tanks, vx.tolist(), vy.tolist(), angular_velocity.tolist()):
+        tank.body.velocity = (x, y)
+        tank.body.angular_velocity = w
+
+
+def update_bullets(bullets):
+    """
+    Vectorized version of Bullet.update.
+    """
+    angle = numpy.array([bullet.body.angle for bullet in bullets]) + math.pi / 2
+    max_speed = numpy.array([bullet.max_speed for bullet in bullets], dtype=float)
+    cos = numpy.cos(angle)
+    sin = numpy.sin(angle)
+    vx = max_speed * cos - 0 * sin
+    vy = max_speed * sin + 0 * cos
+    for bullet, x, y in zip(bullets, vx.tolist(), vy.tolist()):
+        bullet.body.velocity = (x, y)
@@ -1,6 +1,7 @@
 """
 This file contains the Map class and all the different availeble maps
 """
+import json
 import images
 import pygame
 
@@ -33,6 +34,46 @@ class Map:
         """
         return self.boxes[y][x]
 
+    def rock_rectangles(self):
+        """
+        Returns rectangles (x, y, width, height) of tiles which together cover all the rock boxes
+        of the map. The rock boxes of every row are joined into runs, and a run is added to the
+        rectangle above it when that rectangle spans exactly the same columns.
+        """
+        rectangles = []
+        previous_runs = {}  # (x, width) of the runs of the previous row -> index of their rectangle
+        for y in range(self.height):
+            runs = {}
+            x = 0
+            while x < self.width:
+                if self.boxAt(x, y) != 1:
+                    x += 1
+                    continue
+                start = x
+                while x < self.width and self.boxAt(x, y) == 1:
+                    x += 1
+                run = (start, x - start)
+                if run in previous_runs:
+                    index = previous_runs[run]
+                    rect_x, rect_y, width, height = rectangles[index]
+                    rectangles[index] = (rect_x, rect_y, width, height + 1)
+                else:
+                    index = len(rectangles)
+                    rectangles.append((start, y, x - start, 1))
+                runs[run] = index
+            previous_runs = runs
+        return rectangles
+
+
+def load_json_map(map_name):
+    """
+    Loads the map with the given file name from the json_maps directory.
+    """
+    json_file_name = 'json_maps/' + map_name
+    with open(json_file_name) as f:
+        data = json.load(f)
+    return Map(data['width'], data['height'], data['boxes'], data['tanks_start'], data['flag_start'])
+
 
 # The different maps you can choose from
 map0 = Map(9, 9,
@@ -0,0 +1,741 @@
+"""
+This file contains the grid searches used by the Artificial Intelligence to find its way on the map.
+Tiles are packed into a single integer (y * width + x), so the searches only handle plain ints.
+"""
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+import heapq
+import math
+import time
+
+import numpy
+
+# Types of the tiles, as they are written in the maps
+GRASS = 0
+ROCK = 1
+WOOD = 2
+METAL = 3
+
+# Passability modes, telling which tiles a search may go through
+GRASS_AND_WOOD = 0      # Grass and wooden boxes (which can be shot away)
+THROUGH_METAL = 1       # Grass, wooden boxes and metal boxes (which can be pushed)
+WEIGHTED = 2            # Like THROUGH_METAL, but boxes cost the time needed to get them out of the way
+
+# Cost of entering a tile in the weighted search, counted in grass tiles that can be driven in the same time
+# A pushed metal box can get stuck against a rock or another box, or be pushed onto the goal,
+# so like the second breadth first search of the legacy planner, the weighted search only
+# goes through metal boxes when there is no way around them.
+TILE_COSTS = {
+    GRASS: 1,
+    ROCK: None,         # Can't be entered
+    WOOD: 2,            # Driving, plus shooting the box away
+    METAL: 1000         # Pushing the box out of the way, more than any way around it
+}
+
+PATH_CACHE_SIZE = 1024  # Number of paths kept in the path cache of a grid
+FIELD_CACHE_SIZE = 64   # Number of distance fields kept by a grid
+PLANNER_CACHE_SIZE = 16  # Number of incremental planners (one per goal) kept by a grid
+DEADLINE_CHECK = 32     # Number of expansions between two checks of the deadline of a search
+
+
+def pack(x, y, width):
+    """
+    Packs the tile (x, y) into a single integer index.
+    """
+    return y * width + x
+
+
+def unpack(index, width):
+    """
+    Unpacks an integer index into the (x, y) coordinates of its tile.
+    """
+    return index % width, index // width
+
+
+def tile_neighbors(index, width, height):
+    """
+    Returns the indices of all the tiles bordering the tile at index that are inside the map.
+    They are returned in the order (0, 1), (0, -1), (1, 0), (-1, 0), which is the order the searches explore them in.
+    """
+    x, y = index % width, index // width
+    neighbors = []
+    if y + 1 < height:
+        neighbors.append(index + width)
+    if y > 0:
+        neighbors.append(index - width)
+    if x + 1 < width:
+        neighbors.append(index + 1)
+    if x > 0:
+        neighbors.append(index - 1)
+    return neighbors
+
+
+def rebuild_path(parents, goal):
+    """
+    Follows the predecessor table from goal back to the start of the search
+    and returns the path, start and goal included.
+    """
+    path = []
+    node = goal
+    while node is not None:
+        path.append(node)
+        node = parents[node]
+    path.reverse()
+    return path
+
+
+def breadth_first_search(start, goal, width, height, passable):
+    """
+    A Breadth First Search from start to goal, where both are packed tile indices.
+    passable is a flat sequence that tells if the tile at a given index can be entered.
+    Every visited tile remembers the tile it was reached from, so the path is only
+    rebuilt once the goal is found. Returns an empty list if the goal can't be reached.
+    """
+    parents = {start: None}
+    queue = deque([start])
+    while queue:
+        current = queue.popleft()
+        if current == goal:
+            return rebuild_path(parents, goal)
+        for neighbor in tile_neighbors(current, width, height):
+            if neighbor not in parents and passable[neighbor]:
+                parents[neighbor] = current
+                queue.append(neighbor)
+    return []
+
+
+def a_star_search(start, goal, width, height, costs):
+    """
+    An A* search from start to goal, where both are packed tile indices.
+    costs is a flat sequence with the cost of entering the tile at a given index (None if it
+    can't be entered). No tile costs less than 1, so the Manhattan distance is an admissible
+    heuristic and the path found is the cheapest one. Returns an empty list if the goal can't be reached.
+    """
+    goal_x, goal_y = goal % width, goal // width
+    parents = {start: None}
+    best_costs = {start: 0}
+    # Ties are broken by expanding the tile that is furthest from the start first
+    queue = [(abs(start % width - goal_x) + abs(start // width - goal_y), 0, start)]
+    while queue:
+        _, cost, current = heapq.heappop(queue)
+        cost = -cost
+        if current == goal:
+            return rebuild_path(parents, goal)
+        if cost > best_costs[current]:
+            continue        # Already expanded with a lower cost
+        for neighbor in tile_neighbors(current, width, height):
+            step = costs[neighbor]
+            if step is None:
+                continue
+            new_cost = cost + step
+            if new_cost < best_costs.get(neighbor, new_cost + 1):
+                best_costs[neighbor] = new_cost
+                parents[neighbor] = current
+                estimate = new_cost + abs(neighbor % width - goal_x) + abs(neighbor // width - goal_y)
+                heapq.heappush(queue, (estimate, -new_cost, neighbor))
+    return []
+
+
+def wavefront(passable, sources):
+    """
+    Vectorized Breadth First Search. Dilates the frontier of the sources over the
+    passable tiles one step at a time, and returns an array with the distance of every
+    tile to the closest source (-1 for the tiles that can't be reached).
+    passable is a boolean array of shape (height, width), sources a list of (x, y) tiles.
+    """
+    distances = numpy.full(passable.shape, -1, dtype=numpy.int32)
+    frontier = numpy.zeros(passable.shape, dtype=bool)
+    for x, y in sources:
+        frontier[y, x] = True
+    reached = frontier.copy()
+    distance = 0
+    while frontier.any():
+        distances[frontier] = distance
+        grown = numpy.zeros_like(frontier)
+        grown[1:, :] |= frontier[:-1, :]
+        grown[:-1, :] |= frontier[1:, :]
+        grown[:, 1:] |= frontier[:, :-1]
+        grown[:, :-1] |= frontier[:, 1:]
+        frontier = grown & passable & ~reached
+        reached |= frontier
+        distance += 1
+    return distances
+
+
+class PathCache:
+    """
+    A least recently used cache of the paths found on a grid, keyed by
+    (start, goal, passability mode, map revision). It is shared by all the Ai on the map.
+    """
+
+    def __init__(self, max_size=PATH_CACHE_SIZE):
+        """
+        Takes as argument the maximum number of paths to keep (max_size).
+        """
+        self.max_size = max_size
+        self.paths = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.paths)
+
+    def get(self, key):
+        """
+        Returns the cached path for key, or None if it isn't in the cache.
+        """
+        path = self.paths.get(key)
+        if path is None:
+            self.misses += 1
+            return None
+        self.paths.move_to_end(key)
+        self.hits += 1
+        return path
+
+    def peek(self, key):
+        """
+        Returns the cached path for key, or None if it isn't in the cache, without counting
+        a hit or a miss.
+        """
+        return self.paths.get(key)
+
+    def put(self, key, path):
+        """
+        Stores the path for key, evicting the least recently used path if the cache is full.
+        """
+        self.paths[key] = path
+        self.paths.move_to_end(key)
+        if len(self.paths) > self.max_size:
+            self.paths.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all the paths, the hit and miss counters are kept.
+        """
+        self.paths.clear()
+
+    def stats(self):
+        """
+        Returns the counters of the cache, used to size it.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.paths),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class Grid:
+    """
+    The tiles of a map and which of them can be driven through. A single instance
+    is shared by all the Ai playing on the map.
+    """
+
+    def __init__(self, currentmap):
+        """
+        Takes as argument the map (currentmap) whose boxes fill the grid.
+        """
+        self.currentmap = currentmap
+        self.width = currentmap.width
+        self.height = currentmap.height
+        self.revision = 0                   # Increased every time a tile changes
+        self.path_cache = PathCache()
+        self.fields = OrderedDict()         # Distance fields, keyed by (source tile, mode)
+        self.planners = OrderedDict()       # Incremental planners of the weighted searches, keyed by goal
+        self.unfinished = set()             # Keys of the weighted searches stopped by their deadline
+        # Increased every time the passability of a mode changes, the distance fields
+        # of a mode stay valid as long as its passability is unchanged
+        self.passable_revision = {GRASS_AND_WOOD: 0, THROUGH_METAL: 0}
+        self.resets = 0                     # Number of times all the tiles have been put back
+        self.build()
+        self.start = self.snapshot()        # The grid at the start of a round
+
+    def build(self):
+        """
+        Fills the grid with the boxes of the map.
+        """
+        self.tiles = numpy.array(self.currentmap.boxes, dtype=numpy.int8)
+        self.changed_tiles = []             # Indices of the tiles changed since the last reset, in order
+        self.resets += 1
+        self.update_passable()
+        self.invalidate()
+        self.fields.clear()
+
+    def reset(self):
+        """
+        Puts back all the boxes of the map, as they are at the start of a round.
+        """
+        self.restore(self.start)
+
+    def snapshot(self):
+        """
+        Returns a copy of the tiles, their passability and the distance fields, to be given to restore.
+        """
+        return {
+            "tiles": self.tiles.copy(),
+            "passable": {mode: array.copy() for mode, array in self.passable.items()},
+            "passable_flat": {mode: list(flat) for mode, flat in self.passable_flat.items()},
+            "costs_flat": list(self.costs_flat),
+            # The fields that are still valid, they are never modified so they don't have to be copied
+            "fields": OrderedDict((key, field) for key, (revision, field) in self.fields.items() if revision == self.passable_revision[key[1]])
+        }
+
+    def restore(self, snapshot):
+        """
+        Puts the grid back in the state it was in when snapshot was taken.
+        """
+        self.tiles = snapshot["tiles"].copy()
+        self.passable = {mode: array.copy() for mode, array in snapshot["passable"].items()}
+        self.passable_flat = {mode: list(flat) for mode, flat in snapshot["passable_flat"].items()}
+        self.costs_flat = list(snapshot["costs_flat"])
+        self.changed_tiles = []
+        self.resets += 1
+        self.invalidate()
+        # The passability may have changed since the snapshot, so the fields of the snapshot
+        # are put back with new revisions
+        for mode in self.passable_revision:
+            self.passable_revision[mode] += 1
+        self.fields = OrderedDict((key, (self.passable_revision[key[1]], field)) for key, field in snapshot["fields"].items())
+
+    def invalidate(self):
+        """
+        Bumps the revision of the grid and drops the cached paths, which are no longer valid.
+        """
+        self.revision += 1
+        self.path_cache.clear()
+        self.unfinished.clear()
+
+    def update_passable(self):
+        """
+        Recomputes the passability arrays from the tiles. Has to be called whenever a tile changes.
+        """
+        grass_and_wood = (self.tiles == GRASS) | (self.tiles == WOOD)
+        self.passable = {
+            GRASS_AND_WOOD: grass_and_wood,
+            THROUGH_METAL: grass_and_wood | (self.tiles == METAL)
+        }
+        # Flat lists are much faster than numpy arrays to index one tile at a time
+        self.passable_flat = {mode: array.ravel().tolist() for mode, array in self.passable.items()}
+        self.costs_flat = [TILE_COSTS[tile_type] for tile_type in self.tiles.ravel().tolist()]
+
+    def set_tile(self, x, y, tile_type):
+        """
+        Changes the type of the tile (x, y) and updates its passability.
+        """
+        if self.tiles[y, x] == tile_type:
+            return
+        self.tiles[y, x] = tile_type
+        index = pack(x, y, self.width)
+        for mode, passable_types in [(GRASS_AND_WOOD, (GRASS, WOOD)), (THROUGH_METAL, (GRASS, WOOD, METAL))]:
+            if self.passable_flat[mode][index] != (tile_type in passable_types):
+                self.passable[mode][y, x] = tile_type in passable_types
+                self.passable_flat[mode][index] = tile_type in passable_types
+                self.passable_revision[mode] += 1
+        self.costs_flat[index] = TILE_COSTS[tile_type]
+        self.changed_tiles.append(index)
+        self.invalidate()
+
+    def remove_box(self, tile):
+        """
+        Called when the wooden box on tile has been destroyed.
+        """
+        x, y = tile
+        if self.tiles[y, x] == WOOD:
+            self.set_tile(x, y, GRASS)
+
+    def move_metal_box(self, old_tile, new_tile):
+        """
+        Called when a metal box has been pushed from old_tile to new_tile.
+        """
+        if self.tiles[old_tile[1], old_tile[0]] == METAL:
+            self.set_tile(old_tile[0], old_tile[1], GRASS)
+        new_x = min(max(new_tile[0], 0), self.width - 1)
+        new_y = min(max(new_tile[1], 0), self.height - 1)
+        if self.tiles[new_y, new_x] == GRASS:
+            self.set_tile(new_x, new_y, METAL)
+
+    def find_path(self, start, goal, mode=GRASS_AND_WOOD, deadline=None):
+        """
+        Returns the path from start to goal (packed tile indices) through the tiles that
+        are passable in mode, or the cheapest path if mode is WEIGHTED.
+        Paths are looked up in the path cache before searching. The weighted searches are
+        kept by the incremental planner of their goal, shared by all the Ai heading there,
+        and return None if the deadline (time.perf_counter()) was reached before they were done.
+        """
+        key = (start, goal, mode, self.revision)
+        # A search resumed after its deadline has already been counted as a miss
+        path = self.path_cache.peek(key) if key in self.unfinished else self.path_cache.get(key)
+        if path is None:
+            if mode == WEIGHTED:
+                path = self.planner(goal, start).find_path(start, deadline)
+                if path is None:
+                    self.unfinished.add(key)
+                    return None
+                self.unfinished.discard(key)
+                path = tuple(path)
+            else:
+                path = tuple(breadth_first_search(start, goal, self.width, self.height, self.passable_flat[mode]))
+            self.path_cache.put(key, path)
+        return path
+
+    def planner(self, goal, start):
+        """
+        Returns the incremental planner towards goal, creating it with start if there is none.
+        """
+        planner = self.planners.get(goal)
+        if planner is None:
+            planner = IncrementalPlanner(self, start, goal)
+            self.planners[goal] = planner
+            if len(self.planners) > PLANNER_CACHE_SIZE:
+                self.planners.popitem(last=False)
+        self.planners.move_to_end(goal)
+        return planner
+
+    def distance_field(self, sources, mode=GRASS_AND_WOOD):
+        """
+        Returns the distance of every tile to the closest of the (x, y) tiles in sources,
+        going through the tiles that are passable in mode.
+        """
+        return wavefront(self.passable[mode], sources)
+
+    def field_from(self, tile, mode=GRASS_AND_WOOD):
+        """
+        Returns the distance field from the (x, y) tile. Fields are cached and only
+        recomputed when the passability of their mode has changed.
+        """
+        key = (tile, mode)
+        cached = self.fields.get(key)
+        if cached is not None and cached[0] == self.passable_revision[mode]:
+            self.fields.move_to_end(key)
+            return cached[1]
+        field = self.distance_field([tile], mode)
+        self.fields[key] = (self.passable_revision[mode], field)
+        self.fields.move_to_end(key)
+        if len(self.fields) > FIELD_CACHE_SIZE:
+            self.fields.popitem(last=False)
+        return field
+
+    def closest_of(self, start, tiles, mode=GRASS_AND_WOOD):
+        """
+        Returns the position in tiles of the (x, y) tile closest to the (x, y) tile start,
+        going through the tiles that are passable in mode, the first one of them if several
+        are as close. Returns None if none of them can be reached. Like in the distance fields
+        the start tile itself doesn't have to be passable. The search stops at the distance
+        of the closest tile, instead of covering the whole map.
+        """
+        positions = {}          # Packed tile -> its first position in tiles
+        for position, (x, y) in enumerate(tiles):
+            positions.setdefault(pack(x, y, self.width), position)
+        passable = self.passable_flat[mode]
+        start = pack(start[0], start[1], self.width)
+        frontier = [start]
+        reached = {start}
+        while frontier:
+            found = [positions[index] for index in frontier if index in positions]
+            if found:
+                return min(found)
+            next_frontier = []
+            for index in frontier:
+                for neighbor in tile_neighbors(index, self.width, self.height):
+                    if neighbor not in reached and passable[neighbor]:
+                        reached.add(neighbor)
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        return None
+
+    def is_reachable(self, start, goal, mode=GRASS_AND_WOOD):
+        """
+        Tells, using the distance field from goal, if a search from the (x, y) tile start
+        can find the (x, y) tile goal. The start tile itself doesn't have to be passable,
+        so its neighbors are checked too.
+        """
+        if not (0 <= goal[0] < self.width and 0 <= goal[1] < self.height):
+            return False
+        field = self.field_from(goal, mode)
+        index = pack(start[0], start[1], self.width)
+        return any(field[tile // self.width, tile % self.width] >= 0 for tile in [index] + tile_neighbors(index, self.width, self.height))
+
+
+class IncrementalPlanner:
+    """
+    A D* Lite planner towards a fixed goal, over the tile costs of a grid. The search is
+    rooted at the goal, so the start can move along the path, and when tiles of the grid
+    change only the part of the search that depends on them is repaired.
+    """
+
+    def __init__(self, grid, start, goal):
+        """
+        Takes as arguments the grid and the packed indices of the start and goal tiles.
+        """
+        self.grid = grid
+        self.start = start
+        self.goal = goal
+        self.width = grid.width
+        self.height = grid.height
+        self.initialize()
+
+    def initialize(self):
+        """
+        Throws away the search and starts a new one from the goal.
+        """
+        self.costs = list(self.grid.costs_flat)     # Tile costs as the search last saw them
+        self.resets = self.grid.resets
+        self.changes_seen = len(self.grid.changed_tiles)
+        self.key_modifier = 0
+        self.g = {}
+        self.rhs = {self.goal: 0}
+        self.queued = {}                            # Tile index -> key, for the tiles in the queue
+        self.queue = []
+        self.expansions = 0                         # Number of tiles expanded since the search started
+        self.push(self.goal)
+
+    def heuristic(self, a, b):
+        """
+        Manhattan distance between two packed tile indices.
+        """
+        return abs(a % self.width - b % self.width) + abs(a // self.width - b // self.width)
+
+    def calculate_key(self, index):
+        """
+        Returns the priority of a tile in the queue.
+        """
+        best = min(self.g.get(index, math.inf), self.rhs.get(index, math.inf))
+        return (best + self.heuristic(self.start, index) + self.key_modifier, best)
+
+    def push(self, index):
+        """
+        Adds a tile to the queue, replacing its old entry if it already was queued.
+        """
+        key = self.calculate_key(index)
+        self.queued[index] = key
+        heapq.heappush(self.queue, (key, index))
+
+    def top(self):
+        """
+        Returns the key and index of the first tile of the queue, dropping outdated entries.
+        """
+        while self.queue:
+            key, index = self.queue[0]
+            if self.queued.get(index) == key:
+                return key, index
+            heapq.heappop(self.queue)
+        return (math.inf, math.inf), None
+
+    def lowest_rhs(self, index):
+        """
+        Returns the lowest cost of going from a tile to the goal through one of its neighbors.
+        """
+        best = math.inf
+        for neighbor in tile_neighbors(index, self.width, self.height):
+            cost = self.costs[neighbor]
+            if cost is not None:
+                best = min(best, cost + self.g.get(neighbor, math.inf))
+        return best
+
+    def update_vertex(self, index):
+        """
+        Puts a tile in the queue if it is inconsistent, and removes it otherwise.
+        """
+        if index != self.goal:
+            self.rhs[index] = self.lowest_rhs(index)
+        if self.g.get(index, math.inf) != self.rhs.get(index, math.inf):
+            self.push(index)
+        else:
+            self.queued.pop(index, None)
+
+    def compute_shortest_path(self, deadline=None):
+        """
+        Expands tiles until the cost from the start to the goal is known. If the time given by
+        deadline (time.perf_counter()) is passed, stops and returns False, the search is then
+        resumed by the next call.
+        """
+        while True:
+            if deadline is not None and self.expansions % DEADLINE_CHECK == 0 and time.perf_counter() >= deadline:
+                return False
+            key, index = self.top()
+            g_start = self.g.get(self.start, math.inf)
+            if index is None or (key >= self.calculate_key(self.start) and self.rhs.get(self.start, math.inf) == g_start):
+                return True
+            self.expansions += 1
+            new_key = self.calculate_key(index)
+            if key < new_key:
+                self.push(index)
+            elif self.g.get(index, math.inf) > self.rhs.get(index, math.inf):
+                self.g[index] = self.rhs[index]
+                del self.queued[index]
+                # Entering this tile got cheaper, so did leaving its neighbors through it
+                for neighbor in tile_neighbors(index, self.width, self.height):
+                    self.update_vertex(neighbor)
+            else:
+                self.g[index] = math.inf
+                self.update_vertex(index)
+                for neighbor in tile_neighbors(index, self.width, self.height):
+                    self.update_vertex(neighbor)
+
+    def apply_changes(self):
+        """
+        Repairs the search for the tiles of the grid that changed since the last call.
+        Returns False if the grid was reset, in which case the search has to start over.
+        """
+        if self.resets != self.grid.resets:
+            return False
+        changed = self.grid.changed_tiles[self.changes_seen:]
+        self.changes_seen = len(self.grid.changed_tiles)
+        for index in changed:
+            if self.costs[index] == self.grid.costs_flat[index]:
+                continue
+            self.costs[index] = self.grid.costs_flat[index]
+            # The cost of entering the tile changed, which changes the cost of leaving its neighbors
+            for neighbor in tile_neighbors(index, self.width, self.height):
+                self.update_vertex(neighbor)
+        return True
+
+    def find_path(self, start, deadline=None):
+        """
+        Returns the cheapest path (packed tile indices) from start to the goal,
+        or an empty list if the goal can't be reached. Returns None if the deadline
+        was reached before the search was done.
+        """
+        if start != self.start:
+            # Moving the start changes the heuristic of all the queued tiles, which is made
+            # up for by raising the keys of the tiles queued from now on
+            self.key_modifier += self.heuristic(self.start, start)
+            self.start = start
+        if not self.apply_changes():
+            self.initialize()
+        if not self.compute_shortest_path(deadline):
+            return None
+
+        if self.g.get(start, math.inf) == math.inf and start != self.goal:
+            return []
+        # Follow the cheapest neighbor until the goal is reached
+        path = [start]
+        current = start
+        while current != self.goal and len(path) <= self.width * self.height:
+            best = math.inf
+            for neighbor in tile_neighbors(current, self.width, self.height):
+                cost = self.costs[neighbor]
+                if cost is not None and cost + self.g.get(neighbor, math.inf) < best:
+                    best = cost + self.g.get(neighbor, math.inf)
+                    current = neighbor
+            if best == math.inf:
+                return []
+            path.append(current)
+        return path
+
+
+# The shared snapshot of the grid, as seen by a worker process of a ProcessPlanner
+worker_snapshot = None
+
+
+def attach_snapshot(name, width, height):
+    """
+    Runs once in every worker process, and attaches it to the shared snapshot of the grid.
+    """
+    global worker_snapshot
+    memory = shared_memory.SharedMemory(name=name)
+    header = numpy.ndarray((2,), dtype=numpy.int64, buffer=memory.buf)
+    tiles = numpy.ndarray((height, width), dtype=numpy.int8, buffer=memory.buf, offset=header.nbytes)
+    worker_snapshot = {"memory": memory, "header": header, "tiles": tiles, "revision": None, "costs": None}
+
+
+def search_snapshot(start, goal):
+    """
+    Runs in a worker process. Searches the cheapest path from start to goal on the latest
+    snapshot of the grid, and returns it together with the revision it was found on.
+    """
+    snapshot = worker_snapshot
+    header = snapshot["header"]
+    while True:
+        # The planner makes the sequence number odd while it writes the tiles
+        sequence = int(header[0])
+        if sequence % 2 == 1:
+            continue
+        revision = int(header[1])
+        if revision != snapshot["revision"]:
+            tiles = snapshot["tiles"].ravel().tolist()
+        if int(header[0]) == sequence:
+            break
+    if revision != snapshot["revision"]:
+        snapshot["costs"] = [TILE_COSTS[tile_type] for tile_type in tiles]
+        snapshot["revision"] = revision
+    height, width = snapshot["tiles"].shape
+    return tuple(a_star_search(start, goal, width, height, snapshot["costs"])), revision
+
+
+class ProcessPlanner:
+    """
+    Finds weighted paths in a pool of worker processes, so the searches of many Ai run
+    on all the cores. The workers read the tiles from a snapshot of the grid in shared
+    memory, which is only rewritten when the revision of the grid changes. Needs the
+    fork start method, since the main module of the game can't be imported by a worker.
+    """
+
+    def __init__(self, grid, processes):
+        """
+        Takes as arguments the grid and the number of worker processes.
+        """
+        self.grid = grid
+        self.memory = shared_memory.SharedMemory(create=True, size=16 + grid.width * grid.height)
+        self.header = numpy.ndarray((2,), dtype=numpy.int64, buffer=self.memory.buf)
+        self.tiles = numpy.ndarray((grid.height, grid.width), dtype=numpy.int8, buffer=self.memory.buf, offset=self.header.nbytes)
+        self.header[:] = (0, -1)
+        self.publish()
+        self.executor = ProcessPoolExecutor(processes, mp_context=get_context("fork"), initializer=attach_snapshot,
+                                            initargs=(self.memory.name, grid.width, grid.height))
+        self.pending = {}               # Owner -> (future, (start, goal, revision)) of the search it waits for
+
+    def publish(self):
+        """
+        Copies the tiles of the grid into the shared snapshot if they have changed.
+        """
+        if self.header[1] == self.grid.revision:
+            return
+        self.header[0] += 1
+        self.tiles[:] = self.grid.tiles
+        self.header[1] = self.grid.revision
+        self.header[0] += 1
+
+    def find_path(self, owner, start, goal):
+        """
+        Returns the cheapest path (packed tile indices) from start to goal once a worker has
+        found it, or None while it is being searched. owner is whoever asks (an Ai), and has
+        at most one search running at a time. Paths are shared through the path cache of the grid.
+        """
+        key = (start, goal, WEIGHTED, self.grid.revision)
+        request = (start, goal, self.grid.revision)
+        pending = self.pending.get(owner)
+        # The owner asks again every tick until its search is done, the cache only counts the first lookup
+        if pending is not None and pending[1] == request:
+            path = self.grid.path_cache.peek(key)
+        else:
+            path = self.grid.path_cache.get(key)
+        if path is not None:
+            return list(path)
+        self.publish()
+        if pending is not None:
+            future, pending_request = pending
+            if pending_request == request:
+                if not future.done():
+                    return None
+                del self.pending[owner]
+                path, revision = future.result()
+                if revision == self.grid.revision:
+                    self.grid.path_cache.put(key, path)
+                    return list(path)
+            else:
+                future.cancel()
+        self.pending[owner] = (self.executor.submit(search_snapshot, start, goal), request)
+        return None
+
+    def close(self):
+        """
+        Stops the worker processes and frees the shared memory.
+        """
+        self.executor.shutdown(cancel_futures=True)
+        self.memory.close()
+        self.memory.unlink()
@@ -0,0 +1,369 @@
+"""
+Draws a match in a process of its own, so a slow frame doesn't slow down the physics and the ai.
+After every tick the game process publishes where the objects are drawn into a double buffer in
+shared memory, and the render process draws the two latest ticks, interpolated, at whatever
+framerate it can manage. The keys pressed in its window are sent back to the game process.
+
+The shared memory holds:
+    header    int64 (4)                  sequence number (odd while a tick is written), whether the
+                                         window should be shown, whether it is shown, stop
+    ticks     int64 (2)                  tick written in each slot
+    counts    int64 (2)                  number of objects written in each slot
+    times     float64 (2)                when each slot was written (time.perf_counter)
+    objects   float64 (2, capacity, 7)   handle, sprite, visible, light, x, y, orientation
+The newest slot is (sequence // 2) % 2, a tick is always written in the other slot.
+When more objects are drawn than the shared memory holds, the game process copies it into a
+larger one and sends its name to the render process, which moves to it.
+"""
+from multiprocessing import get_context, shared_memory
+import math
+import time
+
+import numpy
+import pygame
+
+import gameobjects
+import images
+import renderer
+
+DISPLAY_FRAMERATE = 144  # Highest number of frames drawn per second by the render process
+TELEPORT_DISTANCE = images.TILE_SIZE  # Pixels an object moves in a tick above which it isn't interpolated
+
+# Fields of the header
+SEQUENCE = 0
+WINDOW = 1
+SHOWN = 2
+STOP = 3
+
+# Columns of the objects
+HANDLE = 0      # Number the object keeps from tick to tick
+SPRITE = 1      # Index of the sprite of the object in images.sprite_list
+VISIBLE = 2     # Whether the object may be seen through the fog of war
+LIGHT = 3       # Whether the object sees through the fog of war (the tanks)
+X = 4           # Position of the center of the object on the screen
+Y = 5
+ORIENTATION = 6  # Orientation of the object on the screen, in degrees
+COLUMNS = 7
+
+
+def buffer_arrays(memory, capacity):
+    """
+    Returns the header, ticks, counts, times and objects arrays of the shared memory.
+    """
+    header = numpy.ndarray((4,), dtype=numpy.int64, buffer=memory.buf)
+    ticks = numpy.ndarray((2,), dtype=numpy.int64, buffer=memory.buf, offset=32)
+    counts = numpy.ndarray((2,), dtype=numpy.int64, buffer=memory.buf, offset=48)
+    times = numpy.ndarray((2,), dtype=numpy.float64, buffer=memory.buf, offset=64)
+    objects = numpy.ndarray((2, capacity, COLUMNS), dtype=numpy.float64, buffer=memory.buf, offset=80)
+    return header, ticks, counts, times, objects
+
+
+def buffer_size(capacity):
+    return 80 + 2 * capacity * COLUMNS * 8
+
+
+class RenderProcess:
+    """
+    Publishes the state of a match for the render process after every tick. Stands in for
+    the Renderer of the match in the game process: draw publishes the tick, the window
+    is handed back to the game process for the screens shown between the rounds, and
+    invalidate hands it to the render process again.
+    """
+
+    def __init__(self, match):
+        """
+        Takes as argument the match to draw, and starts the render process, which opens the window.
+        """
+        self.match = match
+        game_objects = match.game_objects
+        # Every object drawn, and twice the bullets of the pool in case it runs out
+        self.capacity = sum(1 for obj in game_objects if not (isinstance(obj, gameobjects.Box) and not obj.movable)) + 2 * match.bullet_pool.size
+        self.memory = shared_memory.SharedMemory(create=True, size=buffer_size(self.capacity))
+        self.previous_memories = []     # Shared memories the render process may still read, freed when it stops
+        self.header, self.ticks, self.counts, self.times, self.objects = buffer_arrays(self.memory, self.capacity)
+        self.header[:] = (0, 1, 0, 0)
+        self.counts[:] = 0
+        self.handles = {}       # Object -> its handle
+        self.sprite_ids = {sprite: index for index, sprite in enumerate(images.sprite_list())}
+        self.visibility = renderer.VisibilityGrid(match.current_map.width, match.current_map.height, renderer.FOG_RADIUS / images.TILE_SIZE)
+
+        # The display of the game process is closed while the render process shows the match
+        pygame.display.quit()
+        context = get_context("spawn")
+        self.events_queue = context.Queue()
+        self.memory_queue = context.Queue()
+        self.process = context.Process(target=run, args=(self.memory.name, self.capacity, match.current_map, self.events_queue, self.memory_queue), daemon=True)
+        self.process.start()
+        self.screen_surface = None
+
+    def drawn_objects(self):
+        """
+        Returns the objects to draw, in the order they are drawn in.
+        """
+        game_objects = self.match.game_objects
+        boxes = [box for box in self.match.boxes_list if box.movable and box in game_objects]
+        return list(game_objects.bases) + boxes + list(game_objects.tanks) + list(game_objects.flags) + list(game_objects.bullets)
+
+    def grow(self, capacity):
+        """
+        Copies the shared memory into a new one holding capacity objects per tick, and sends its
+        name to the render process. The previous one is kept until the render process stops, as
+        it reads it until it has moved to the new one.
+        """
+        memory = shared_memory.SharedMemory(create=True, size=buffer_size(capacity))
+        header, ticks, counts, times, objects = buffer_arrays(memory, capacity)
+        header[:] = self.header
+        ticks[:] = self.ticks
+        counts[:] = self.counts
+        times[:] = self.times
+        objects[:, :self.capacity] = self.objects
+        self.previous_memories.append(self.memory)
+        self.memory = memory
+        self.capacity = capacity
+        self.header, self.ticks, self.counts, self.times, self.objects = header, ticks, counts, times, objects
+        self.memory_queue.put((memory.name, capacity))
+
+    def draw(self):
+        """
+        Publishes the state of the match after the last tick.
+        """
+        tanks = self.match.game_objects.tanks
+        self.visibility.update(tanks)
+        rows = []
+        for obj in self.drawn_objects():
+            sprite = self.sprite_ids.get(obj.sprite)
+            if sprite is None:
+                continue
+            handle = self.handles.setdefault(obj, len(self.handles))
+            x, y = obj.screen_position()
+            rows.append((handle, sprite, self.visibility.sees(obj), isinstance(obj, gameobjects.Tank), x, y, obj.screen_orientation()))
+        if len(rows) > self.capacity:
+            # More bullets are flying than the pool was made for
+            self.grow(max(2 * self.capacity, len(rows)))
+
+        sequence = int(self.header[SEQUENCE])
+        slot = (sequence // 2 + 1) % 2
+        self.header[SEQUENCE] = sequence + 1
+        if rows:
+            self.objects[slot, :len(rows)] = rows
+        self.counts[slot] = len(rows)
+        self.ticks[slot] = self.match.total_game_time
+        self.times[slot] = time.perf_counter()
+        self.header[SEQUENCE] = sequence + 2
+
+    def events(self):
+        """
+        Returns the events of the window sent by the render process since the last call.
+        """
+        events = []
+        while not self.events_queue.empty():
+            event_type, key = self.events_queue.get()
+            events.append(pygame.event.Event(event_type, key=key))
+        return events
+
+    @property
+    def screen(self):
+        """
+        Takes the window back from the render process and returns the screen of the game process.
+        """
+        if self.screen_surface is None:
+            self.header[WINDOW] = 0
+            while self.header[SHOWN] and self.process.is_alive():
+                time.sleep(0.001)
+            self.screen_surface = pygame.display.set_mode(self.match.current_map.rect().size)
+        return self.screen_surface
+
+    def invalidate(self):
+        """
+        Has to be called once the game process has shown its screen, so the render process shows the match again.
+        """
+        if self.screen_surface is not None:
+            pygame.display.quit()
+            self.screen_surface = None
+        self.header[WINDOW] = 1
+
+    def close(self):
+        """
+        Stops the render process and frees the shared memory.
+        """
+        self.header[STOP] = 1
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.events_queue.close()
+        self.memory_queue.close()
+        self.header = self.ticks = self.counts = self.times = self.objects = None
+        for memory in self.previous_memories + [self.memory]:
+            memory.close()
+            memory.unlink()
+
+
+class RemoteView:
+    """
+    Runs in the render process, and draws the match published by a RenderProcess.
+    """
+
+    def __init__(self, memory_name, capacity, current_map, events_queue, memory_queue):
+        """
+        Takes as arguments the name of the shared memory, the number of objects it holds, the
+        map, the queue the events of the window are sent back through and the queue the larger
+        shared memories are announced through.
+        """
+        self.memory = shared_memory.SharedMemory(name=memory_name)
+        self.header, self.ticks, self.counts, self.times, self.objects = buffer_arrays(self.memory, capacity)
+        self.current_map = current_map
+        self.events_queue = events_queue
+        self.memory_queue = memory_queue
+        self.screen = None
+        self.caption_time = time.perf_counter()
+        self.caption_tick = 0
+        self.tick = 0           # Tick of the newest state read
+        self.frames = 0
+
+    def open_window(self):
+        """
+        Opens the window, and paints the grass and the rocks, which never move, on the static layer.
+        """
+        self.screen = pygame.display.set_mode(self.current_map.rect().size)
+        images.convert_images()
+        self.sprites = images.sprite_list()
+        self.static_layer = pygame.Surface(self.screen.get_size())
+        for x in range(self.current_map.width):
+            for y in range(self.current_map.height):
+                self.static_layer.blit(images.grass, (x * images.TILE_SIZE, y * images.TILE_SIZE))
+                if self.current_map.boxAt(x, y) == 1:
+                    self.static_layer.blit(images.rockbox, (x * images.TILE_SIZE, y * images.TILE_SIZE))
+        self.fog = pygame.Surface(self.screen.get_size())
+        self.fog.set_colorkey((69, 69, 69))
+        self.light_mask = pygame.Surface((2 * renderer.FOG_RADIUS, 2 * renderer.FOG_RADIUS))
+        self.light_mask.set_colorkey((0, 0, 0))
+        pygame.draw.circle(self.light_mask, (69, 69, 69), (renderer.FOG_RADIUS, renderer.FOG_RADIUS), renderer.FOG_RADIUS)
+        self.header[SHOWN] = 1
+
+    def follow_memory(self):
+        """
+        Moves to the larger shared memory the game process has copied the objects into, if any.
+        """
+        while not self.memory_queue.empty():
+            name, capacity = self.memory_queue.get()
+            memory = shared_memory.SharedMemory(name=name)
+            self.header, self.ticks, self.counts, self.times, self.objects = buffer_arrays(memory, capacity)
+            # The window may have been opened or closed since the game process copied the header
+            self.header[SHOWN] = int(self.screen is not None)
+            self.memory.close()
+            self.memory = memory
+
+    def close_window(self):
+        pygame.display.quit()
+        self.screen = None
+        self.header[SHOWN] = 0
+
+    def read(self):
+        """
+        Returns the objects of the two latest ticks, the newest first, with the time they were written at.
+        """
+        while True:
+            sequence = int(self.header[SEQUENCE])
+            if sequence % 2 == 1:
+                continue
+            newest = (sequence // 2) % 2
+            current = self.objects[newest, :self.counts[newest]].tolist()
+            previous = self.objects[1 - newest, :self.counts[1 - newest]].tolist()
+            tick = int(self.ticks[newest])
+            current_time = float(self.times[newest])
+            previous_time = float(self.times[1 - newest])
+            if int(self.header[SEQUENCE]) == sequence:
+                return current, previous, tick, current_time, previous_time
+
+    def interpolated(self):
+        """
+        Returns the objects of the two latest ticks interpolated, the display being one tick behind the game.
+        """
+        current, previous, tick, current_time, previous_time = self.read()
+        self.tick = tick
+        interval = current_time - previous_time
+        if not previous or interval <= 0:
+            return current
+        alpha = min(max((time.perf_counter() - current_time) / interval, 0.0), 1.0)
+        previous_rows = {row[HANDLE]: row for row in previous}
+        objects = []
+        for row in current:
+            before = previous_rows.get(row[HANDLE])
+            if before is not None and math.hypot(row[X] - before[X], row[Y] - before[Y]) < TELEPORT_DISTANCE:
+                row = list(row)
+                row[X] = before[X] + (row[X] - before[X]) * alpha
+                row[Y] = before[Y] + (row[Y] - before[Y]) * alpha
+                turn = (row[ORIENTATION] - before[ORIENTATION] + 180) % 360 - 180
+                row[ORIENTATION] = before[ORIENTATION] + turn * alpha
+            objects.append(row)
+        return objects
+
+    def draw(self):
+        """
+        Draws one frame: the static layer, the objects that may be seen and the fog of war.
+        """
+        self.screen.blit(self.static_layer, (0, 0))
+        self.fog.fill((0, 0, 0))
+        for handle, sprite, visible, light, x, y, orientation in self.interpolated():
+            if light:
+                self.fog.blit(self.light_mask, (int(x) - renderer.FOG_RADIUS, int(y) - renderer.FOG_RADIUS))
+            if visible:
+                surface, offset = images.rotated(self.sprites[int(sprite)], orientation)
+                self.screen.blit(surface, (x - offset[0], y - offset[1]))
+        self.screen.blit(self.fog, (0, 0))
+        pygame.display.flip()
+        self.frames += 1
+
+    def forward_events(self):
+        """
+        Sends the events of the window the game reacts to back to the game process.
+        """
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.events_queue.put((event.type, None))
+            elif event.type == pygame.KEYDOWN or event.type == pygame.KEYUP:
+                self.events_queue.put((event.type, event.key))
+
+    def update_caption(self):
+        """
+        Reports how many ticks the game does and how many frames are drawn per second, once per second.
+        """
+        now = time.perf_counter()
+        if now - self.caption_time >= 1:
+            pygame.display.set_caption("Capture the flag - %.0f ticks/s - %.0f frames/s" % ((self.tick - self.caption_tick) / (now - self.caption_time), self.frames / (now - self.caption_time)))
+            self.caption_time = now
+            self.caption_tick = self.tick
+            self.frames = 0
+
+    def run(self):
+        """
+        Draws the match until the game process stops it.
+        """
+        clock = pygame.time.Clock()
+        while True:
+            self.follow_memory()
+            if self.header[STOP]:
+                break
+            if self.header[WINDOW] and self.screen is None:
+                self.open_window()
+            elif not self.header[WINDOW] and self.screen is not None:
+                self.close_window()
+            if self.screen is None:
+                time.sleep(0.01)
+                continue
+            self.draw()
+            self.forward_events()
+            self.update_caption()
+            clock.tick(DISPLAY_FRAMERATE)
+        if self.screen is not None:
+            self.close_window()
+        self.header = self.ticks = self.counts = self.times = self.objects = None
+        self.memory.close()
+
+
+def run(memory_name, capacity, current_map, events_queue, memory_queue):
+    """
+    Entry point of the render process.
+    """
+    pygame.init()
+    RemoteView(memory_name, capacity, current_map, events_queue, memory_queue).run()
@@ -0,0 +1,469 @@
+"""
+Draws a match on the display.
+The renderer only reads the state of the match, so a match can be simulated
+without it, for instance on a server without any display.
+"""
+import math
+import time
+import numpy
+import pygame
+import pymunk
+
+import images
+import engine
+import gameobjects
+
+DIRTY_RECTANGLES = True  # Only repaints the parts of the screen that can have changed instead of the whole screen
+FULL_REDRAW_FRACTION = 0.5  # Fraction of the screen above which the whole screen is repainted at once
+FOG_RADIUS = 80  # Radius in pixels of the area the tanks can see through the fog of war
+
+
+class VisibilityGrid:
+    """
+    The tiles of the map that may be seen through the fog of war. Every tank lights the
+    tiles around the tile it is on, and the grid is only updated when a tank changes tile.
+    A tile is lit if an object standing on it could be drawn in the circle of a tank
+    anywhere on its tile, so the objects on the dark tiles can be skipped without hiding
+    anything that would have been seen.
+    """
+
+    def __init__(self, width, height, radius):
+        """
+        Takes as arguments the size of the map and the radius of the circle the tanks see, in tiles.
+        """
+        self.width = width
+        self.height = height
+        self.lights = numpy.zeros((height, width), dtype=numpy.int16)  # Number of tanks lighting every tile
+        self.lit = set()  # Tiles lit by at least one tank
+        self.tank_tiles = {}  # Tank -> tile it lights the tiles around
+        # The tiles lit around the tile of a tank. The objects are at most a tile wide, even when
+        # rotated, so their tile is lit if it is less than the radius and a tile away from the tank.
+        self.reach = int(math.ceil(radius)) + 2
+        gaps = numpy.maximum(numpy.abs(numpy.arange(-self.reach, self.reach + 1)) - 1, 0)
+        self.mask = (gaps[:, None] ** 2 + gaps[None, :] ** 2 < (radius + 1) ** 2).astype(numpy.int16)
+
+    def update(self, tanks):
+        """
+        Moves the light of the tanks that have changed tile since the last update.
+        """
+        for tank in tanks:
+            tile = self.tile_at(tank.body.position)
+            previous_tile = self.tank_tiles.get(tank)
+            if tile != previous_tile:
+                if previous_tile is not None:
+                    self.light(previous_tile, -1)
+                self.light(tile, 1)
+                self.tank_tiles[tank] = tile
+
+    def light(self, tile, amount):
+        """
+        Adds amount to the lights of the tiles around tile, clipping the mask to the map.
+        """
+        x, y = tile
+        left, top = max(x - self.reach, 0), max(y - self.reach, 0)
+        right, bottom = min(x + self.reach + 1, self.width), min(y + self.reach + 1, self.height)
+        mask_x, mask_y = left - (x - self.reach), top - (y - self.reach)
+        self.lights[top:bottom, left:right] += amount * self.mask[mask_y:mask_y + bottom - top, mask_x:mask_x + right - left]
+        for tile_y in range(top, bottom):
+            for tile_x in range(left, right):
+                if self.lights[tile_y, tile_x] > 0:
+                    self.lit.add((tile_x, tile_y))
+                else:
+                    self.lit.discard((tile_x, tile_y))
+
+    def tile_at(self, position):
+        """
+        Returns the tile of the map a position is on.
+        """
+        return (min(max(int(position[0]), 0), self.width - 1), min(max(int(position[1]), 0), self.height - 1))
+
+    def sees(self, obj):
+        """
+        Returns whether a game object may be seen through the fog of war.
+        """
+        if isinstance(obj, gameobjects.GamePhysicsObject):
+            x, y = obj.body.position
+        else:
+            x, y = obj.x, obj.y
+        return (int(x), int(y)) in self.lit
+
+
+class Renderer:
+    """
+    Draws the background, the game objects and the fog of war of a match.
+    """
+
+    def __init__(self, match):
+        """
+        Takes as argument the match to draw, and resizes the screen to the size of its map.
+        """
+        self.match = match
+        self.screen = pygame.display.set_mode(match.current_map.rect().size)
+        self.background = pygame.Surface(self.screen.get_size())
+        self.generate_background()
+        self.baked_round = None  # Round the static layer was painted for, it is painted on the first frame
+        self.screen_black = self.fog_of_war((0, 0, 0))
+        self.screen_black.set_colorkey((69, 69, 69))
+        self.light_mask = self.create_light_mask()
+        self.visibility = VisibilityGrid(match.current_map.width, match.current_map.height, FOG_RADIUS / images.TILE_SIZE)
+        self.caption_time = time.perf_counter()  # When the caption was last updated
+        self.full_redraw = True  # Whether the next frame has to repaint the whole screen
+        # The rock boxes never move, so they are looked up by tile instead of in the space
+        self.rocks = {box.tile: box for box in match.game_objects.boxes if not box.movable}
+        self.box_order = {box: index for index, box in enumerate(match.boxes_list)}
+
+    # -- Created the fog of war
+    def fog_of_war(self, fog_of_war_color):
+        """
+        Creates the fog of war
+        """
+        screen_black = pygame.Surface(self.screen.get_size())
+        screen_black.fill(fog_of_war_color)
+        return screen_black
+
+    def create_light_mask(self):
+        """
+        Creates the circle a tank sees through the fog of war, which is copied on the fog at
+        the position of every tank. Its black corners are transparent.
+        """
+        light_mask = pygame.Surface((2 * FOG_RADIUS, 2 * FOG_RADIUS))
+        light_mask.fill((0, 0, 0))
+        light_mask.set_colorkey((0, 0, 0))
+        pygame.draw.circle(light_mask, (69, 69, 69), (FOG_RADIUS, FOG_RADIUS), FOG_RADIUS)
+        return light_mask
+
+    # -- Generate the background
+    def generate_background(self):
+        """
+        Generates background tiles for the game
+        """
+        for x in range(0, self.match.current_map.width):
+            for y in range(0, self.match.current_map.height):
+                # The blit function will copy the image cointained in image.grass to the
+                # coordinates given at the second argument
+                self.background.blit(images.grass, (x * images.TILE_SIZE, y * images.TILE_SIZE))
+
+    def invalidate(self):
+        """
+        Has to be called when something else has been drawn on the screen, so the next frame repaints all of it.
+        """
+        self.full_redraw = True
+
+    def events(self):
+        """
+        Returns the events of the window the match is drawn in.
+        """
+        return pygame.event.get()
+
+    def close(self):
+        """
+        Nothing to release, the match is drawn in the game process.
+        """
+
+    def draw(self):
+        """
+        Draws the current state of the match and updates the display.
+        Outside of the fog of war circles the screen stays black, so only the circles the
+        tanks see through, this frame and the last one, can have changed. They are repainted
+        alone, unless they cover most of the screen.
+        """
+        tanks = self.match.game_objects.tanks
+        self.visibility.update(tanks)
+        dirty_rects = []
+        for obj in tanks:
+            rect = self.fog_rect(obj)
+            if obj.circle != []:
+                rect = rect.union(obj.circle[0])
+            dirty_rects.append(rect)
+        screen_area = self.screen.get_width() * self.screen.get_height()
+        full_redraw = not DIRTY_RECTANGLES or self.full_redraw or sum(rect.w * rect.h for rect in dirty_rects) > FULL_REDRAW_FRACTION * screen_area
+        # Only what is in the circles the tanks see this frame is shown on a full redraw
+        seen_rects = [self.fog_rect(obj) for obj in tanks] if full_redraw else dirty_rects
+        found = self.objects_near(seen_rects)
+        self.update_static_layer(seen_rects, found)
+        objects = self.moving_objects(found)
+        if full_redraw:
+            self.draw_screen(objects)
+            self.full_redraw = False
+        else:
+            self.draw_rects(dirty_rects, objects)
+
+        self.update_caption()
+
+    def fog_rect(self, tank):
+        """
+        Returns the rectangle of the screen covered by the circle the tank sees through the fog of war.
+        """
+        x, y = tank.body.position * images.TILE_SIZE
+        return pygame.Rect(int(x) - FOG_RADIUS - 1, int(y) - FOG_RADIUS - 1, 2 * FOG_RADIUS + 3, 2 * FOG_RADIUS + 3).clip(self.screen.get_rect())
+
+    def draw_fog(self):
+        """
+        Draws the circles the tanks see through on the fog of war.
+        """
+        for obj in self.match.game_objects.tanks:
+            x, y = obj.body.position * images.TILE_SIZE
+            obj.circle[:] = [self.screen_black.blit(self.light_mask, (int(x) - FOG_RADIUS, int(y) - FOG_RADIUS))]
+
+    def draw_screen(self, objects):
+        """
+        Repaints the whole screen, from the static layer, the given moving objects and the fog of war.
+        """
+        # Displays the background and the boxes that don't move on the screen
+        self.screen.blit(self.static_layer, (0, 0))
+
+        # Update the display of the moving objects on the screen
+        for obj in objects:
+            obj.update_screen(self.screen)
+
+        # Display fog of war on the screen
+        self.screen_black.fill((0, 0, 0))
+        self.draw_fog()
+        self.screen.blit(self.screen_black, (0, 0))
+
+        # Redisplay the entire screen (see double buffer technique)
+        pygame.display.flip()
+
+    def draw_rects(self, rects, objects):
+        """
+        Repaints the given rectangles of the screen, from the static layer, the given moving
+        objects and the fog of war.
+        """
+        for rect in rects:
+            self.screen_black.fill((0, 0, 0), rect)
+        self.draw_fog()
+        for rect in rects:
+            self.screen.set_clip(rect)
+            self.screen.blit(self.static_layer, rect.topleft, rect)
+            for obj in objects:
+                obj.update_screen(self.screen)
+            self.screen.blit(self.screen_black, rect.topleft, rect)
+        self.screen.set_clip(None)
+        pygame.display.update(rects)
+
+    def tiles_of(self, rect):
+        """
+        Returns the tiles (left, top, right, bottom) of a rectangle of the screen, with a tile of margin.
+        The sprites are as large as the shapes, a tile is enough for the rotated ones.
+        """
+        return (rect.left // images.TILE_SIZE - 1, rect.top // images.TILE_SIZE - 1,
+                rect.right // images.TILE_SIZE + 1, rect.bottom // images.TILE_SIZE + 1)
+
+    def objects_near(self, rects):
+        """
+        Returns the game objects of the space that may be drawn in the given rectangles of the screen.
+        """
+        game_objects = self.match.game_objects
+        found = set()
+        for rect in rects:
+            left, top, right, bottom = self.tiles_of(rect)
+            for shape in self.match.space.bb_query(pymunk.BB(left, top, right + 1, bottom + 1), pymunk.ShapeFilter()):
+                obj = getattr(shape, "parent", None)
+                if obj is not None and obj in game_objects:
+                    found.add(obj)
+        return found
+
+    def moving_objects(self, found):
+        """
+        Returns the boxes among found that aren't in the static layer, with the rocks drawn over
+        them, and the tanks, flags and bullets that may be seen, in the order they are drawn in.
+        The tanks and the bullets aren't taken from found, as their bounding boxes are only updated
+        by the next step of the space after they have been teleported by a reset or fired.
+        """
+        game_objects = self.match.game_objects
+        sees = self.visibility.sees
+        boxes = [obj for obj in found if obj in self.loose and sees(obj)]
+        boxes += self.rocks_over(boxes)
+        boxes.sort(key=self.box_order.get)
+        tanks = [obj for obj in game_objects.tanks if sees(obj)]
+        flags = [obj for obj in game_objects.flags if sees(obj)]
+        bullets = [obj for obj in game_objects.bullets if sees(obj)]
+        return boxes + tanks + flags + bullets
+
+    def rocks_over(self, boxes):
+        """
+        Returns the rocks created after one of the given loose boxes that overlap it, which
+        are drawn again over it.
+        """
+        rocks = set()
+        for box in boxes:
+            rect = self.state_rect(self.loose[box])
+            left, top, right, bottom = self.tiles_of(rect)
+            for tile_x in range(left, right + 1):
+                for tile_y in range(top, bottom + 1):
+                    rock = self.rocks.get((tile_x, tile_y))
+                    if rock is not None and self.box_order[rock] > self.box_order[box] and rect.colliderect(self.state_rect(self.drawn_state(rock))):
+                        rocks.add(rock)
+        return list(rocks)
+
+    # -- The static layer
+    def bake_static_layer(self):
+        """
+        Paints the background, the bases and all the boxes on the static layer.
+        """
+        game_objects = self.match.game_objects
+        self.static_layer = self.background.copy()
+        self.baked = {}         # Movable box -> sprite and position it is painted with on the static layer
+        self.baked_tiles = {}   # Tile -> movable boxes painted on the static layer around it
+        self.loose = {}         # Movable box that has moved -> sprite and position it was drawn with last frame
+        for obj in game_objects.bases:
+            obj.update_screen(self.static_layer)
+        for box in game_objects.boxes:
+            if box.movable:
+                self.bake(box, self.drawn_state(box), repaint=False)
+            else:
+                box.update_screen(self.static_layer)
+        self.baked_round = self.match.total_round_number
+        self.box_count = len(game_objects.boxes)
+
+    def drawn_state(self, box):
+        """
+        Returns the rotated sprite of a box and the pixel it is drawn at.
+        """
+        sprite, p = box.screen_sprite()
+        return (sprite, int(p[0]), int(p[1]))
+
+    def state_tile(self, state):
+        sprite, x, y = state
+        return ((x + sprite.get_width() // 2) // images.TILE_SIZE, (y + sprite.get_height() // 2) // images.TILE_SIZE)
+
+    def state_rect(self, state):
+        """
+        Returns the rectangle of the screen a box is painted in.
+        """
+        sprite, x, y = state
+        return pygame.Rect(x, y, sprite.get_width(), sprite.get_height())
+
+    def baked_near(self, rect):
+        """
+        Returns the movable boxes painted on the static layer that may overlap a rectangle of the screen.
+        """
+        left, top, right, bottom = self.tiles_of(rect)
+        boxes = []
+        for tile_x in range(left, right + 1):
+            for tile_y in range(top, bottom + 1):
+                boxes.extend(self.baked_tiles.get((tile_x, tile_y), ()))
+        return boxes
+
+    def bake(self, box, state, repaint=True):
+        """
+        Paints a movable box on the static layer. The area is painted again, so the boxes
+        created after it are still painted over it.
+        """
+        self.baked[box] = state
+        self.baked_tiles.setdefault(self.state_tile(state), set()).add(box)
+        if repaint:
+            self.repaint(self.state_rect(state))
+        else:
+            sprite, x, y = state
+            self.static_layer.blit(sprite, (x, y))
+
+    def unbake(self, box):
+        """
+        Removes a movable box from the static layer, by painting again what was under it.
+        """
+        state = self.baked.pop(box)
+        self.baked_tiles[self.state_tile(state)].discard(box)
+        self.repaint(self.state_rect(state))
+
+    def repaint(self, rect):
+        """
+        Paints a rectangle of the static layer again, from the background, the bases, the rocks
+        and the movable boxes painted on it, in the order the boxes were created.
+        """
+        left, top, right, bottom = self.tiles_of(rect)
+        boxes = [self.rocks[(tile_x, tile_y)] for tile_x in range(left, right + 1) for tile_y in range(top, bottom + 1) if (tile_x, tile_y) in self.rocks]
+        boxes += self.baked_near(rect)
+        boxes.sort(key=self.box_order.get)
+
+        self.static_layer.set_clip(rect)
+        self.static_layer.blit(self.background, rect.topleft, rect)
+        for obj in self.match.game_objects.bases:
+            obj.update_screen(self.static_layer)
+        for obj in boxes:
+            if obj.movable:
+                sprite, x, y = self.baked[obj]
+                self.static_layer.blit(sprite, (x, y))
+            else:
+                obj.update_screen(self.static_layer)
+        self.static_layer.set_clip(None)
+
+    def over_loose_box(self, box, state):
+        """
+        Returns whether a box would be painted over a loose box created before it, which is
+        drawn after the static layer and so would be drawn over it instead.
+        """
+        rect = self.state_rect(state)
+        order = self.box_order[box]
+        return any(self.box_order[other] < order and rect.colliderect(self.state_rect(other_state))
+                   for other, other_state in self.loose.items())
+
+    def unbake_covered(self):
+        """
+        Removes from the static layer the boxes that overlap a loose box created before them,
+        and draws them every frame too, so the boxes are always drawn in the order they were
+        created. The boxes they overlap are checked in turn.
+        """
+        pending = list(self.loose)
+        while pending:
+            box = pending.pop()
+            rect = self.state_rect(self.loose[box])
+            order = self.box_order[box]
+            for other in self.baked_near(rect):
+                if self.box_order[other] > order and rect.colliderect(self.state_rect(self.baked[other])):
+                    self.unbake(other)
+                    self.loose[other] = self.drawn_state(other)
+                    pending.append(other)
+
+    def update_static_layer(self, rects, found):
+        """
+        Checks the movable boxes that may be seen in the given rectangles of the screen, found
+        being the objects of the space near them. A box that has moved is removed from the static
+        layer and drawn every frame, until it stays still for a frame and is painted back on it.
+        A box that overlaps a loose box created before it is drawn every frame as well, as the
+        loose box has to be drawn under it. The boxes that can't be seen aren't checked, the
+        static layer can be out of date under the fog of war.
+        """
+        game_objects = self.match.game_objects
+        if self.baked_round != self.match.total_round_number:
+            # The boxes have been put back at the start of the round
+            self.bake_static_layer()
+        elif len(game_objects.boxes) != self.box_count:
+            # Boxes have been destroyed
+            for box in [box for box in self.baked if box not in game_objects]:
+                self.unbake(box)
+            for box in [box for box in self.loose if box not in game_objects]:
+                del self.loose[box]
+            self.box_count = len(game_objects.boxes)
+
+        # The boxes around the rectangles, and the ones painted there which may have moved away since
+        boxes = {obj for obj in found if isinstance(obj, gameobjects.Box) and obj.movable}
+        for rect in rects:
+            boxes.update(self.baked_near(rect))
+        # In the order they were created, so a box knows whether the boxes under it are loose
+        for box in sorted(boxes, key=self.box_order.get):
+            if box not in game_objects:
+                continue
+            state = self.drawn_state(box)
+            if box in self.baked:
+                if self.baked[box] != state:
+                    self.unbake(box)
+                    self.loose[box] = state
+            elif self.loose.get(box) == state and not self.over_loose_box(box, state):
+                del self.loose[box]
+                self.bake(box, state)
+            else:
+                self.loose[box] = state
+        self.unbake_covered()
+
+    def update_caption(self):
+        """
+        Reports how fast the game runs and how much of the planning budget the ai have used,
+        once per second of game time.
+        """
+        if self.match.total_game_time % engine.FRAMERATE == 0:
+            now = time.perf_counter()
+            ticks_per_second = engine.FRAMERATE / max(now - self.caption_time, 1e-9)
+            self.caption_time = now
+            planning = self.match.planning_scheduler.stats()
+            pygame.display.set_caption("Capture the flag - %.0f ticks/s - planning %.1f ms avg, %.1f ms max of %.1f ms" % (ticks_per_second, planning["average_ms"], planning["max_ms"], planning["budget_ms"]))
@@ -0,0 +1,311 @@
+"""
+Records the commands given to the tanks of a match into a binary file, and replays them.
+A replay doesn't run the ai, it gives the tanks the commands that were recorded, so it
+plays out exactly like the recorded match however long the ai took to search paths.
+Hashes of the state of the match are recorded at keyframes to detect desyncs.
+
+The file starts with a header and is followed by records, which are only ever appended:
+    "CTFR", version (u16), length of the header (u32), header (json)
+    TICKS     n (varint)                                  n ticks without any command
+    COMMANDS  count (varint), count * (tank (u8), code (u8))   one tick, the highest bit of
+                                                          the code is set for ai commands
+    KEYFRAME  tick (varint), hash of the state (8 bytes)  state of the match after tick
+    INDEX     count (varint), count * (tick, offset) (varints)  where the keyframes are
+The index is written when the recording is closed, followed by its offset (u64) and "CTFX".
+A file without index, for instance when the game crashed, is still read by scanning it.
+
+Example: python replay.py match.ctfr --render
+"""
+import argparse
+import json
+import struct
+import time
+
+import pygame
+
+import engine
+import images
+import maps
+import renderer
+
+VERSION = 1
+MAGIC = b"CTFR"
+INDEX_MAGIC = b"CTFX"
+KEYFRAME_INTERVAL = 250  # Ticks between two keyframes
+
+# Record types
+TICKS = 1
+COMMANDS = 2
+KEYFRAME = 3
+INDEX = 4
+
+# Codes of the commands, the highest bit tells if the ai gave the command
+COMMAND_CODES = ["accelerate", "decelerate", "turn_left", "turn_right", "stop_turning", "stop_moving", "shoot"]
+AI_COMMAND = 0x80
+
+
+def encode_varint(value):
+    """
+    Returns a non negative integer encoded with 7 bits per byte, lowest bits first.
+    """
+    data = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            data.append(byte | 0x80)
+        else:
+            data.append(byte)
+            return bytes(data)
+
+
+def decode_varint(data, offset):
+    """
+    Returns the integer encoded by encode_varint at offset, and the offset after it.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class Recorder:
+    """
+    Writes the commands given to the tanks of a match to a replay file, tick by tick.
+    """
+
+    def __init__(self, file_name, match, map_name, keyframe_interval=KEYFRAME_INTERVAL):
+        """
+        Takes as arguments the name of the file to write, the match to record (which has
+        to be recorded from its start), the name of its map and the ticks between two keyframes.
+        """
+        self.file = open(file_name, "wb")
+        self.keyframe_interval = keyframe_interval
+        self.ticks = 0
+        self.empty_ticks = 0        # Ticks without commands that haven't been written yet
+        self.keyframes = []         # (tick, offset) of the keyframes written
+        current_map = match.current_map
+        header = {
+            "map_name": map_name,
+            "map": {"width": current_map.width, "height": current_map.height, "boxes": current_map.boxes,
+                    "tanks_start": current_map.start_positions, "flag_start": current_map.flag_position},
+            "difficulty": match.difficulty,
+            "player": match.player,
+            "seed": match.seed,
+            "merged_rocks": engine.MERGED_ROCKS,
+            "framerate": engine.FRAMERATE,
+            "keyframe_interval": keyframe_interval,
+        }
+        header_data = json.dumps(header).encode("utf-8")
+        self.file.write(MAGIC + struct.pack("<HI", VERSION, len(header_data)) + header_data)
+        self.write_keyframe(match)
+        match.recorder = self
+
+    def flush_empty_ticks(self):
+        if self.empty_ticks:
+            self.file.write(bytes([TICKS]) + encode_varint(self.empty_ticks))
+            self.empty_ticks = 0
+
+    def write_keyframe(self, match):
+        self.flush_empty_ticks()
+        self.keyframes.append((self.ticks, self.file.tell()))
+        self.file.write(bytes([KEYFRAME]) + encode_varint(self.ticks) + match.state_hash())
+        # Makes sure that the file can be replayed up to here even if the game crashes
+        self.file.flush()
+
+    def record_tick(self, match):
+        """
+        Records the commands given to the tanks during the tick the match has just done.
+        """
+        self.ticks += 1
+        commands = [(tank_index, COMMAND_CODES.index(command)) for tank_index, command in match.input_commands]
+        commands += [(tank_index, COMMAND_CODES.index(command) | AI_COMMAND) for tank_index, command in match.ai_commands]
+        if commands:
+            self.flush_empty_ticks()
+            data = bytearray([COMMANDS])
+            data += encode_varint(len(commands))
+            for tank_index, code in commands:
+                data += bytes((tank_index, code))
+            self.file.write(data)
+        else:
+            self.empty_ticks += 1
+        if self.ticks % self.keyframe_interval == 0:
+            self.write_keyframe(match)
+
+    def close(self, match):
+        """
+        Writes the last keyframe and the index, and closes the file.
+        """
+        match.recorder = None
+        if self.keyframes[-1][0] != self.ticks:
+            self.write_keyframe(match)
+        index_offset = self.file.tell()
+        data = bytearray([INDEX])
+        data += encode_varint(len(self.keyframes))
+        for tick, offset in self.keyframes:
+            data += encode_varint(tick) + encode_varint(offset)
+        self.file.write(data + struct.pack("<Q", index_offset) + INDEX_MAGIC)
+        self.file.close()
+
+
+class Replay:
+    """
+    A replay file that has been read.
+    """
+
+    def __init__(self, file_name):
+        """
+        Reads the replay file with the given name.
+        """
+        with open(file_name, "rb") as f:
+            self.data = f.read()
+        if self.data[:4] != MAGIC:
+            raise ValueError("%s is not a replay file" % file_name)
+        version, header_length = struct.unpack_from("<HI", self.data, 4)
+        if version != VERSION:
+            raise ValueError("%s has version %d, only version %d can be replayed" % (file_name, version, VERSION))
+        self.header = json.loads(self.data[10:10 + header_length].decode("utf-8"))
+        self.records_offset = 10 + header_length
+        self.records_end = len(self.data)
+        self.keyframes = self.read_index()
+
+    def read_index(self):
+        """
+        Returns the (tick, offset) of every keyframe, from the index or by scanning the records.
+        """
+        if self.data[-4:] == INDEX_MAGIC:
+            index_offset, = struct.unpack_from("<Q", self.data, len(self.data) - 12)
+            self.records_end = index_offset
+            count, offset = decode_varint(self.data, index_offset + 1)
+            keyframes = []
+            for i in range(count):
+                tick, offset = decode_varint(self.data, offset)
+                keyframe_offset, offset = decode_varint(self.data, offset)
+                keyframes.append((tick, keyframe_offset))
+            return keyframes
+        return [(tick, offset) for kind, tick, offset, value in self.records() if kind == KEYFRAME]
+
+    @property
+    def ticks(self):
+        """
+        Number of ticks up to the last keyframe.
+        """
+        return self.keyframes[-1][0] if self.keyframes else 0
+
+    def create_match(self):
+        """
+        Returns a new match, set up like the recorded one.
+        """
+        # The rocks collide differently when they are merged, so they are made like in the recording
+        engine.MERGED_ROCKS = self.header.get("merged_rocks", False)
+        map_data = self.header["map"]
+        current_map = maps.Map(map_data["width"], map_data["height"], map_data["boxes"], map_data["tanks_start"], map_data["flag_start"])
+        return engine.Match(current_map, self.header["difficulty"], self.header["player"], seed=self.header["seed"])
+
+    def records(self):
+        """
+        Yields the records of the file as (type, tick, offset, value): the commands given
+        during the tick for COMMANDS records, and the hash for KEYFRAME records. Runs of
+        ticks without commands are yielded as one COMMANDS record per tick. Stops at a
+        record that was only partly written.
+        """
+        data = self.data[:self.records_end]
+        offset = self.records_offset
+        tick = 0
+        # Reading past the end of data raises an IndexError when the last record was cut
+        try:
+            while offset < len(data):
+                record_offset = offset
+                kind = data[offset]
+                offset += 1
+                if kind == TICKS:
+                    count, offset = decode_varint(data, offset)
+                    for i in range(count):
+                        tick += 1
+                        yield COMMANDS, tick, record_offset, []
+                elif kind == COMMANDS:
+                    count, offset = decode_varint(data, offset)
+                    commands = [(data[offset + 2 * i], data[offset + 2 * i + 1]) for i in range(count)]
+                    offset += 2 * count
+                    tick += 1
+                    yield COMMANDS, tick, record_offset, commands
+                elif kind == KEYFRAME:
+                    keyframe_tick, offset = decode_varint(data, offset)
+                    keyframe_hash = data[offset:offset + 8]
+                    if len(keyframe_hash) < 8:
+                        return
+                    offset += 8
+                    yield KEYFRAME, keyframe_tick, record_offset, keyframe_hash
+                elif kind == INDEX:
+                    return
+                else:
+                    raise ValueError("Unknown record type %d at offset %d" % (kind, record_offset))
+        except IndexError:
+            return
+
+    def play(self, match, on_tick=None):
+        """
+        Replays the recorded commands on match, which has to be new, and checks its state at
+        every keyframe. on_tick is called after every tick, for instance to draw the match, and
+        stops the replay if it returns True. Returns the ticks played and the ticks of the
+        keyframes where the state was different from the recorded one.
+        """
+        desyncs = []
+        ticks = 0
+        for kind, tick, offset, value in self.records():
+            if kind == KEYFRAME:
+                if match.state_hash() != value:
+                    desyncs.append(tick)
+                continue
+            for tank_index, code in value:
+                if not code & AI_COMMAND:
+                    match.apply_command(tank_index, COMMAND_CODES[code])
+            match.step([(tank_index, COMMAND_CODES[code & ~AI_COMMAND]) for tank_index, code in value if code & AI_COMMAND])
+            ticks = tick
+            if on_tick is not None and on_tick():
+                break
+        return ticks, desyncs
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Replays a recorded match of capture the flag')
+    parser.add_argument("file", help="Replay file to play")
+    parser.add_argument("--render", dest="render", action="store_true", help="Shows the match at %d ticks per second instead of replaying it as fast as possible" % engine.FRAMERATE)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    replay = Replay(args.file)
+    print("%s, %s, %d ticks, %d keyframes" % (replay.header["map_name"], replay.header["difficulty"], replay.ticks, len(replay.keyframes)))
+    match = replay.create_match()
+    on_tick = None
+    if args.render:
+        pygame.init()
+        pygame.display.set_mode()
+        images.convert_images()
+        view = renderer.Renderer(match)
+        clock = pygame.time.Clock()
+
+        def on_tick():
+            view.draw()
+            clock.tick(engine.FRAMERATE)
+            return any(event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE) for event in pygame.event.get())
+
+    start_time = time.perf_counter()
+    ticks, desyncs = replay.play(match, on_tick)
+    wall_time = time.perf_counter() - start_time
+    match.close()
+    print("Replayed %d ticks in %.2f s (%.0f ticks/s), scores %s" % (ticks, wall_time, ticks / max(wall_time, 1e-9), "-".join(str(tank.score) for tank in match.tanks_list)))
+    if desyncs:
+        raise SystemExit("Desync, the state was different from the recorded one at the keyframes of ticks %s" % ", ".join(str(tick) for tick in desyncs))
+    print("The state matched the recording at every keyframe")
+
+
+if __name__ == "__main__":
+    main()
@@ -37,4 +37,6 @@ source ctf-env/bin/activate
 # Make sure the required libraries are installed
 pip install pymunk==6.5.1
 pip install pygame==2.5.0
+pip install numpy
+pip install pytest
 pip install pycodestyle
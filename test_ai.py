@@ -0,0 +1,60 @@
+"""
+Tests of the ai. Run with: python -m pytest
+"""
+import pytest
+from pymunk import Vec2d
+
+import ai
+import engine
+import maps
+
+
+def create_match():
+    return engine.Match(maps.map0, "normal", False, planning_budget=float("inf"))
+
+
+def test_bot_without_route_is_not_pursuer():
+    match = create_match()
+    bot = match.ai_list[1]
+    bot.target_tile = ()        # The carrier has no route home
+    assert not bot.is_pursuer()
+    bot.target_tile = None      # Nobody carries the flag
+    assert not bot.is_pursuer()
+    match.close()
+
+
+def test_bot_with_route_is_pursuer():
+    match = create_match()
+    bot = match.ai_list[1]
+    bot.target_tile = (Vec2d(4, 4), Vec2d(4, 5))
+    assert bot.is_pursuer()
+    match.close()
+
+
+def test_scheduler_plans_pursuers_first():
+    match = create_match()
+    without_route, pursuer = match.ai_list[0], match.ai_list[2]
+    without_route.target_tile = ()
+    pursuer.target_tile = (Vec2d(4, 4),)
+    order = ai.PlanningScheduler().begin_tick(match.ai_list)
+    assert order[0] is pursuer
+    assert order.index(without_route) > 0
+    match.close()
+
+
+def play(current_map, seed, legacy_bfs, monkeypatch):
+    monkeypatch.setattr(ai, "LEGACY_BFS", legacy_bfs)
+    match = engine.Match(current_map, "normal", False, planning_budget=float("inf"), seed=seed)
+    engine.fast_forward(match)
+    match.close()
+    return match.total_game_time, sum(tank.score for tank in match.tanks_list)
+
+
+@pytest.mark.parametrize("current_map, seed", [(maps.map0, 0), (maps.map1, 0), (maps.map2, 2)])
+def test_weighted_planner_wins_as_fast_as_legacy(current_map, seed, monkeypatch):
+    monkeypatch.setattr(engine, "GAME_TIME_LIMIT", 10000)
+    weighted_ticks, weighted_points = play(current_map, seed, False, monkeypatch)
+    legacy_ticks, legacy_points = play(current_map, seed, True, monkeypatch)
+    assert legacy_points == 1
+    assert weighted_points == 1
+    assert weighted_ticks <= legacy_ticks
@@ -0,0 +1,55 @@
+"""
+Tests of the simulation of a match. Run with: python -m pytest
+"""
+import math
+import random
+
+import engine
+import maps
+import pathfinding
+
+
+def create_match(seed):
+    return engine.Match(maps.map0, "normal", False, planning_budget=float("inf"), seed=seed)
+
+
+def bullet_ticks(match):
+    return [bot.bullet_tick for bot in match.ai_list]
+
+
+def test_seeded_matches_dont_share_random_state():
+    global_state = random.getstate()
+    first = create_match(3)
+    create_match(4).reset_round()
+    second = create_match(3)
+    assert bullet_ticks(first) == bullet_ticks(second)
+    first.reset_round()
+    second.reset_round()
+    assert bullet_ticks(first) == bullet_ticks(second)
+    assert random.getstate() == global_state
+
+
+def test_unseeded_match_draws_nothing():
+    match = create_match(None)
+    assert match.random is None
+    assert bullet_ticks(match) == [50] * len(match.ai_list)
+
+
+def test_pushed_metal_box_moves_on_the_grid():
+    match = create_match(None)
+    tank = match.tanks_list[0]
+    match.ai_list = [bot for bot in match.ai_list if bot.tank is not tank]
+    # Left of the metal box at (3, 4), facing it
+    tank.body.position = (1.5, 4.5)
+    tank.body.angle = -math.pi / 2
+    match.space.reindex_shapes_for_body(tank.body)
+    box = next(box for box in match.metal_boxes if box.tile == (3, 4))
+    for tick in range(100):
+        tank.accelerate()
+        match.step()
+        if box.tile != (3, 4):
+            break
+    assert box.tile == (4, 4)
+    assert match.grid.tiles[4, 3] == pathfinding.GRASS
+    assert match.grid.tiles[4, 4] == pathfinding.METAL
+    match.close()
@@ -0,0 +1,30 @@
+"""
+Tests of the grid searches. Run with: python -m pytest
+"""
+import maps
+import pathfinding
+
+
+def tile(grid, x, y):
+    return pathfinding.pack(x, y, grid.width)
+
+
+def test_weighted_searches_share_the_planner_of_their_goal():
+    grid = pathfinding.Grid(maps.map0)
+    goal = tile(grid, 4, 4)
+    first = grid.find_path(tile(grid, 0, 0), goal, pathfinding.WEIGHTED)
+    second = grid.find_path(tile(grid, 8, 8), goal, pathfinding.WEIGHTED)
+    assert first[-1] == goal and second[-1] == goal
+    assert list(grid.planners) == [goal]
+    assert grid.find_path(tile(grid, 0, 0), goal, pathfinding.WEIGHTED) == first
+    stats = grid.path_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_search_resumed_after_its_deadline_is_one_miss():
+    grid = pathfinding.Grid(maps.map0)
+    start, goal = tile(grid, 0, 0), tile(grid, 4, 4)
+    assert grid.find_path(start, goal, pathfinding.WEIGHTED, deadline=0) is None
+    assert grid.find_path(start, goal, pathfinding.WEIGHTED)[-1] == goal
+    stats = grid.path_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (0, 1)
@@ -0,0 +1,37 @@
+"""
+Tests of the publication of a match to the render process. Run with: python -m pytest
+"""
+import queue
+
+import engine
+import maps
+import render_process
+
+
+def test_draw_grows_the_shared_memory(monkeypatch):
+    monkeypatch.setenv("SDL_VIDEODRIVER", "dummy")
+    match = engine.Match(maps.map0, "normal", False, planning_budget=float("inf"))
+    view = render_process.RenderProcess(match)
+    try:
+        capacity = view.capacity
+        first_memory = view.memory
+        for i in range(capacity):
+            match.game_objects.add(match.bullet_pool.acquire(1.5 + i / capacity, 1.5, 0))
+        view.draw()
+        drawn = len([obj for obj in view.drawn_objects() if view.sprite_ids.get(obj.sprite) is not None])
+        assert drawn > capacity
+        assert view.capacity >= drawn
+
+        # A view still reading the first shared memory moves to the new one and reads every object
+        memory_queue = queue.Queue()
+        memory_queue.put((view.memory.name, view.capacity))
+        remote = render_process.RemoteView(first_memory.name, capacity, match.current_map, None, memory_queue)
+        remote.follow_memory()
+        current, previous, tick, current_time, previous_time = remote.read()
+        assert len(current) == drawn
+        assert tick == match.total_game_time
+        remote.header = remote.ticks = remote.counts = remote.times = remote.objects = None
+        remote.memory.close()
+    finally:
+        view.close()
+        match.close()
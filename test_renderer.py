@@ -0,0 +1,79 @@
+"""
+Tests of the drawing of a match, without any display. Run with: python -m pytest
+"""
+import os
+
+import pygame
+import pytest
+
+import engine
+import images
+import maps
+import renderer
+
+
+@pytest.fixture(autouse=True)
+def display():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.display.set_mode((10, 10))
+    images.convert_images()
+    yield
+    pygame.display.quit()
+
+
+def create_view(current_map):
+    match = engine.Match(current_map, "normal", False, planning_budget=float("inf"))
+    return renderer.Renderer(match)
+
+
+def full_redraw(view):
+    """
+    Returns the screen the match is drawn on when every object is drawn, in the order they were created.
+    """
+    game_objects = view.match.game_objects
+    surface = view.background.copy()
+    for objects in (game_objects.bases, game_objects.boxes, game_objects.tanks, game_objects.flags, game_objects.bullets):
+        for obj in objects:
+            obj.update_screen(surface)
+    fog = pygame.Surface(surface.get_size())
+    fog.set_colorkey((69, 69, 69))
+    for tank in game_objects.tanks:
+        x, y = tank.body.position * images.TILE_SIZE
+        fog.blit(view.light_mask, (int(x) - renderer.FOG_RADIUS, int(y) - renderer.FOG_RADIUS))
+    surface.blit(fog, (0, 0))
+    return surface
+
+
+def assert_same_pixels(view):
+    assert pygame.image.tostring(view.screen, "RGB") == pygame.image.tostring(full_redraw(view), "RGB")
+
+
+def test_moving_box_is_drawn_under_boxes_created_after_it():
+    view = create_view(maps.map1)
+    view.draw()
+    match = view.match
+    first = match.boxes_list[0]
+    later = next(box for box in match.boxes_list if box.movable and box.tile == (1, 0))
+    assert view.box_order[first] < view.box_order[later]
+    # Half on the box created after it, in the sight of the first tank
+    first.body.position = later.body.position + (0.5, 0.5)
+    match.space.reindex_shapes_for_body(first.body)
+    view.draw()
+    assert first in view.loose
+    assert_same_pixels(view)
+    # Once it stands still both boxes are painted back on the static layer, in order
+    view.draw()
+    assert first in view.baked and later in view.baked
+    assert_same_pixels(view)
+
+
+def test_frames_are_the_same_as_full_redraws_on_map1(monkeypatch):
+    monkeypatch.setattr(engine, "POINTS_TO_WIN", 3)
+    view = create_view(maps.map1)
+    for tick in range(1200):
+        view.match.step()
+        if tick == 600:
+            view.match.reset_round()
+        view.draw()
+        assert_same_pixels(view)
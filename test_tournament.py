@@ -0,0 +1,19 @@
+"""
+Tests of the tournament runner. Run with: python -m pytest
+"""
+import math
+
+import engine
+import tournament
+
+
+def play(seed):
+    result = tournament.play_match(("map2", "normal", seed, math.inf, False, False))
+    return result["ticks"], result["rounds"], result["scores"]
+
+
+def test_seeds_change_the_results(monkeypatch):
+    monkeypatch.setattr(engine, "GAME_TIME_LIMIT", 3000)
+    results = {seed: play(seed) for seed in (1, 2)}
+    assert results[1] != results[2]
+    assert play(2) == results[2]
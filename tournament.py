@@ -0,0 +1,148 @@
+"""
+Plays many ai-vs-ai matches in parallel, to compare the difficulties and the maps.
+Every match runs in its own process with its own pymunk space, without any display.
+Every match has its own seed, which decides the random numbers drawn by its ai, so
+the matches of a map and difficulty are different samples and can be played again.
+
+Example: python tournament.py --maps map0 map1 --difficulties easy hard --matches 4
+"""
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import csv
+import math
+import os
+import time
+
+import ai
+import engine
+import maps
+
+BUILTIN_MAPS = ["map0", "map1", "map2"]
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Plays ai-vs-ai matches of capture the flag in parallel')
+    parser.add_argument("--maps", metavar="", dest="maps", nargs="+", default=BUILTIN_MAPS, help="Maps to play, map0, map1, map2 or the file name of a json map, default is all the built in maps")
+    parser.add_argument("--difficulties", metavar="", dest="difficulties", nargs="+", choices=["easy", "normal", "hard"], default=["easy", "normal", "hard"], help="Difficulties to play, default is all of them")
+    parser.add_argument("--matches", metavar="", dest="matches", type=int, default=1, help="Number of matches per map and difficulty, default is %(default)s")
+    parser.add_argument("--seed", metavar="", dest="seed", type=int, default=0, help="Seed of the first match, the following matches use the next seeds, default is %(default)s")
+    parser.add_argument("--processes", metavar="", dest="processes", type=int, default=os.cpu_count(), help="Number of matches played at the same time, default is the number of cores")
+    parser.add_argument("--planning-budget", metavar="", dest="planning_budget", type=float, default=math.inf,
+                        help="Milliseconds per tick the ai may spend on finding paths, default is no limit so the results don't depend on the load of the machine")
+    parser.add_argument("--legacy-bfs", dest="legacy_bfs", action="store_true", help="Makes the ai use the old breadth first search instead of the weighted A* search")
+    parser.add_argument("--merged-rocks", dest="merged_rocks", action="store_true", help="Makes the rocks a few large walls, which is faster on big maps but doesn't collide exactly like one box per tile")
+    parser.add_argument("--csv", metavar="", dest="csv", help="Also writes the results to the given csv file")
+    return parser.parse_args()
+
+
+def load_map(map_name):
+    """
+    Returns the built in map with the given name, or loads the json map with the given file name.
+    """
+    if map_name in BUILTIN_MAPS:
+        return getattr(maps, map_name)
+    return maps.load_json_map(map_name)
+
+
+def play_match(task):
+    """
+    Plays one match until someone has won the game, and returns its result.
+    Runs in a process of the pool, so it only takes and returns plain values.
+    """
+    map_name, difficulty, seed, planning_budget, legacy_bfs, merged_rocks = task
+    ai.LEGACY_BFS = legacy_bfs
+    engine.MERGED_ROCKS = merged_rocks
+    match = engine.Match(load_map(map_name), difficulty, False, 0, planning_budget, seed)
+    try:
+        statistics = engine.fast_forward(match)
+    finally:
+        match.close()
+    statistics["map"] = map_name
+    statistics["difficulty"] = difficulty
+    statistics["seed"] = seed
+    return statistics
+
+
+def create_tasks(args):
+    """
+    Returns one task per match, every match with its own seed.
+    """
+    tasks = []
+    seed = args.seed
+    for map_name in args.maps:
+        for difficulty in args.difficulties:
+            for i in range(args.matches):
+                tasks.append((map_name, difficulty, seed, args.planning_budget, args.legacy_bfs, args.merged_rocks))
+                seed += 1
+    return tasks
+
+
+def run_tournament(tasks, processes):
+    """
+    Plays all the matches over a pool of processes and returns their results, in the order of the tasks.
+    """
+    if processes <= 1:
+        return [play_match(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(play_match, tasks))
+
+
+def format_scores(scores):
+    """
+    Returns the scores of the tanks of a match as one string, such as 0-1-0-0.
+    """
+    return "-".join(str(score) for score in scores)
+
+
+def print_results(results, wall_time):
+    """
+    Prints one row per match, followed by the totals of every map and difficulty.
+    """
+    print("%-12s %-10s %6s %7s %6s %-20s %9s %9s" % ("map", "difficulty", "seed", "ticks", "rounds", "scores", "time (s)", "ticks/s"))
+    for result in results:
+        print("%-12s %-10s %6d %7d %6d %-20s %9.2f %9.0f" % (result["map"], result["difficulty"], result["seed"], result["ticks"], result["rounds"], format_scores(result["scores"]), result["wall_time"], result["ticks_per_second"]))
+
+    print()
+    print("%-12s %-10s %7s %-20s %10s %13s" % ("map", "difficulty", "matches", "total scores", "avg rounds", "avg time (s)"))
+    totals = {}
+    for result in results:
+        key = (result["map"], result["difficulty"])
+        if key not in totals:
+            totals[key] = {"matches": 0, "scores": [0] * len(result["scores"]), "rounds": 0, "wall_time": 0.0}
+        total = totals[key]
+        total["matches"] += 1
+        total["scores"] = [a + b for a, b in zip(total["scores"], result["scores"])]
+        total["rounds"] += result["rounds"]
+        total["wall_time"] += result["wall_time"]
+    for (map_name, difficulty), total in totals.items():
+        print("%-12s %-10s %7d %-20s %10.1f %13.2f" % (map_name, difficulty, total["matches"], format_scores(total["scores"]), total["rounds"] / total["matches"], total["wall_time"] / total["matches"]))
+
+    ticks = sum(result["ticks"] for result in results)
+    print()
+    print("%d matches, %d ticks in %.2f s (%.1f matches/s, %.0f ticks/s)" % (len(results), ticks, wall_time, len(results) / wall_time, ticks / wall_time))
+
+
+def write_csv(results, file_name):
+    """
+    Writes one row per match to a csv file.
+    """
+    with open(file_name, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["map", "difficulty", "seed", "ticks", "rounds", "scores", "wall_time", "ticks_per_second"])
+        for result in results:
+            writer.writerow([result["map"], result["difficulty"], result["seed"], result["ticks"], result["rounds"], format_scores(result["scores"]), result["wall_time"], result["ticks_per_second"]])
+
+
+def main():
+    args = parse_arguments()
+    tasks = create_tasks(args)
+    start_time = time.perf_counter()
+    results = run_tournament(tasks, args.processes)
+    wall_time = time.perf_counter() - start_time
+    print_results(results, wall_time)
+    if args.csv is not None:
+        write_csv(results, args.csv)
+
+
+if __name__ == "__main__":
+    main()